@@ -0,0 +1,162 @@
+"""ASGI-приложение поверх WSGI-обработчика Django.
+
+Django 2.2 не умеет ни ASGI, ни асинхронных представлений, а ORM у него
+синхронный, с соединениями, привязанными к потоку. Поэтому цикл событий
+только принимает запросы и отдаёт ответы, а представление целиком,
+со всеми запросами к базе, выполняется в пуле из ASGI_THREADS потоков.
+Медленный клиент занимает корутину, а не поток: поток освобождается,
+как только ответ собран. Потоковые ответы (выгрузки) читаются
+по частям тоже в пуле.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+# Тела запросов больше этого размера пишутся во временный файл.
+BODY_MEMORY_SIZE = 2 * 1024 * 1024
+
+
+def build_environ(scope, body):
+    """WSGI environ для HTTP-запроса ASGI с телом body (файл)."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin1'),
+        'PATH_INFO': scope['path'].encode().decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+        environ['REMOTE_PORT'] = str(scope['client'][1])
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    return environ
+
+
+class ResponseStart:
+    """start_response для WSGI, запоминающий статус и заголовки."""
+
+    def __init__(self):
+        self.status = None
+        self.headers = None
+
+    def __call__(self, status, headers, exc_info=None):
+        self.status = int(status.split(' ', 1)[0])
+        self.headers = [
+            (name.lower().encode('latin1'), value.encode('latin1'))
+            for name, value in headers
+        ]
+
+
+class AsgiHandler:
+    """ASGI-приложение, выполняющее WSGI-приложение в пуле потоков."""
+
+    def __init__(self, wsgi_application, executor=None):
+        self.wsgi_application = wsgi_application
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS,
+            thread_name_prefix='asgi',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f'Неподдерживаемый тип ASGI: {scope["type"]}')
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_SIZE)
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return
+            body.write(message.get('body', b''))
+            more_body = message.get('more_body', False)
+        body.seek(0)
+        environ = build_environ(scope, body)
+        loop = asyncio.get_running_loop()
+        try:
+            start, content, chunks = await loop.run_in_executor(
+                self.executor, self.respond, environ
+            )
+            await send({
+                'type': 'http.response.start',
+                'status': start.status,
+                'headers': start.headers,
+            })
+            if chunks is None:
+                await send({'type': 'http.response.body', 'body': content})
+                return
+            try:
+                while content is not None:
+                    await send({
+                        'type': 'http.response.body',
+                        'body': content,
+                        'more_body': True,
+                    })
+                    content = await loop.run_in_executor(
+                        self.executor, next, chunks, None
+                    )
+            finally:
+                await loop.run_in_executor(self.executor, chunks.close)
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            body.close()
+
+    def respond(self, environ):
+        """Выполняет запрос в потоке пула.
+
+        Обычный ответ собирается и закрывается здесь же, в потоке,
+        где открыто соединение с базой. Для потокового возвращается
+        первая часть и итератор остальных.
+        """
+        start = ResponseStart()
+        response = self.wsgi_application(environ, start)
+        if not getattr(response, 'streaming', False):
+            try:
+                return start, b''.join(response), None
+            finally:
+                if hasattr(response, 'close'):
+                    response.close()
+        chunks = self.iter_streaming(response)
+        return start, next(chunks, None), chunks
+
+    @staticmethod
+    def iter_streaming(response):
+        try:
+            yield from response
+        finally:
+            response.close()
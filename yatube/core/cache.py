@@ -0,0 +1,94 @@
+"""Кеш с защитой от одновременного пересчёта (cache stampede).
+
+Значение хранится вместе со сроком годности и временем, которое ушло
+на его вычисление. Незадолго до истечения срока один из запросов
+с вероятностью, растущей к концу срока, пересчитывает значение заранее
+(probabilistic early expiration). Пересчёт выполняется под ключом-замком:
+остальные процессы в это время получают прежнее значение, а при холодном
+кеше ждут, пока его вычислит владелец замка.
+
+Замок — cache.add, он атомарен в memcached и в locmem. В FileBasedCache
+Django add — это has_key и затем set, и несколько процессов могли бы
+взять замок одновременно, поэтому для него замок — flock на файле
+рядом с кешем: его держит один процесс, а при падении владельца
+система снимает его сама.
+"""
+import hashlib
+import math
+import os
+import random
+import time
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache import cache as default_cache
+from django.core.cache.backends.filebased import FileBasedCache
+
+try:
+    import fcntl
+except ImportError:  # Windows: остаётся cache.add.
+    fcntl = None
+
+BETA = 1.0
+LOCK_TIMEOUT = 10
+WAIT_STEP = 0.05
+
+
+def is_fresh(expires, delta, beta=BETA):
+    return time.time() - delta * beta * math.log(1 - random.random()) < expires
+
+
+def acquire(cache, lock_key):
+    """Берёт замок; возвращает функцию, которая его снимает, или None."""
+    if cache is default_cache:
+        cache = caches[DEFAULT_CACHE_ALIAS]
+    if fcntl is not None and isinstance(cache, FileBasedCache):
+        return _acquire_file(cache, lock_key)
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        return lambda: cache.delete(lock_key)
+    return None
+
+
+def _acquire_file(cache, lock_key):
+    cache._createdir()
+    name = hashlib.md5(lock_key.encode()).hexdigest() + '.lock'
+    fd = os.open(os.path.join(cache._dir, name), os.O_CREAT | os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return lambda: os.close(fd)
+
+
+def get_or_recompute(key, compute, timeout, cache=default_cache):
+    """Возвращает значение по ключу, вызывая compute() в одном процессе.
+
+    Запись живёт в кеше вдвое дольше timeout, чтобы после истечения
+    срока было что отдавать, пока значение пересчитывается.
+    """
+    entry = cache.get(key)
+    if entry is not None and is_fresh(entry[2], entry[1]):
+        return entry[0]
+    release = acquire(cache, f'{key}:lock')
+    if release is not None:
+        try:
+            start = time.time()
+            value = compute()
+            finished = time.time()
+            cache.set(
+                key,
+                (value, finished - start, finished + timeout),
+                timeout * 2,
+            )
+        finally:
+            release()
+        return value
+    if entry is not None:
+        return entry[0]
+    deadline = time.time() + LOCK_TIMEOUT
+    while time.time() < deadline:
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return compute()
@@ -0,0 +1,13 @@
+from django.utils.functional import SimpleLazyObject
+
+from posts.follows import followed_ids
+
+
+def follows(request):
+    """Добавляет множество id авторов, на которых подписан зритель.
+
+    Запрос к базе выполняется, только если шаблон обратился к множеству.
+    """
+    return {
+        'followed_ids': SimpleLazyObject(lambda: followed_ids(request))
+    }
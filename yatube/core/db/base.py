@@ -0,0 +1,29 @@
+"""SQLite, настроенный для сайта под нагрузкой.
+
+Обычный бэкенд sqlite3 с двумя добавками:
+
+* при открытии соединения выполняются PRAGMA из ключа PRAGMAS настроек
+  базы: WAL, чтобы чтение не ждало записи, synchronous=NORMAL, размер
+  кеша страниц и mmap;
+* транзакции начинаются с BEGIN IMMEDIATE (ключ TRANSACTION_MODE):
+  блокировка записи берётся сразу, и конкурирующий писатель ждёт её
+  в обработчике занятости sqlite (OPTIONS['timeout']), повторяя
+  попытки. С обычным BEGIN транзакция, которая сначала читала,
+  при переходе к записи получает «database is locked» без ожидания.
+
+Соединения переиспользуются между запросами (CONN_MAX_AGE), поэтому
+PRAGMA выполняются редко.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict.get('PRAGMAS', {}).items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict.get('TRANSACTION_MODE', 'DEFERRED')
+        self.cursor().execute(f'BEGIN {mode}')
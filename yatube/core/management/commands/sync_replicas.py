@@ -0,0 +1,46 @@
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def copy_database(source, target):
+    """Копирует базу SQLite source в target через backup API."""
+    with closing(sqlite3.connect(source)) as source_db, \
+            closing(sqlite3.connect(target)) as target_db:
+        source_db.backup(target_db)
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики из DATABASE_REPLICAS. '
+        'Это локальная замена репликации: с --interval копирование '
+        'повторяется, пока команду не остановят.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float,
+            help='Повторять копирование раз в столько секунд.',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: перечислите файлы в YATUBE_DB_REPLICAS.'
+            )
+        source = settings.DATABASES['default']['NAME']
+        if not os.path.exists(source):
+            raise CommandError(f'Нет основной базы {source}.')
+        while True:
+            started = time.perf_counter()
+            for alias in settings.DATABASE_REPLICAS:
+                copy_database(source, settings.DATABASES[alias]['NAME'])
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f'Реплики обновлены за {elapsed:.0f} мс')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
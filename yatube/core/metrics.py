@@ -0,0 +1,158 @@
+"""Метрики запросов без внешнего APM.
+
+MetricsMiddleware заводит на время запроса RequestMetrics: число
+SQL-запросов и время в БД, в отрисовке шаблонов, в миниатюрах и всего.
+Итог уходит в заголовок Server-Timing и в гистограммы процесса,
+сгруппированные по имени URL (posts:index, posts:profile, ...).
+Гистограммы отдаёт персоналу представление core:metrics.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+TIMERS = ('db', 'template', 'thumbnail')
+TIME_BOUNDS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BOUNDS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+QUANTILES = (0.5, 0.9, 0.99)
+
+_local = threading.local()
+_lock = threading.Lock()
+_histograms = {}
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.durations = dict.fromkeys(TIMERS, 0.0)
+        self.depth = dict.fromkeys(TIMERS, 0)
+
+    def server_timing(self, total):
+        """Значение заголовка Server-Timing, время в миллисекундах."""
+        return ', '.join([
+            f'db;dur={self.durations["db"]:.1f};'
+            f'desc="{self.queries} queries"',
+            f'template;dur={self.durations["template"]:.1f}',
+            f'thumbnail;dur={self.durations["thumbnail"]:.1f}',
+            f'total;dur={total:.1f}',
+        ])
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин.
+
+    Квантиль оценивается верхней границей корзины, в которую он попал,
+    для значений за последней границей — наибольшим наблюдением.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        data = {
+            'count': self.count,
+            'mean': round(self.sum / self.count, 2) if self.count else 0,
+            'max': round(self.max, 2),
+        }
+        for q in QUANTILES:
+            data[f'p{round(q * 100)}'] = round(self.quantile(q), 2)
+        data['buckets'] = dict(zip(
+            [str(bound) for bound in self.bounds] + ['+Inf'],
+            self.counts,
+        ))
+        return data
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+def start():
+    _local.metrics = RequestMetrics()
+    return _local.metrics
+
+
+def finish():
+    metrics, _local.metrics = current(), None
+    return metrics
+
+
+@contextmanager
+def timer(name):
+    """Добавляет время блока к метрике name текущего запроса.
+
+    Вложенные замеры той же метрики (шаблон внутри шаблона) не
+    суммируются повторно. Вне запроса, например в фоновом потоке,
+    ничего не делает. Годится и как декоратор.
+    """
+    metrics = current()
+    if metrics is None or metrics.depth[name]:
+        yield
+        return
+    metrics.depth[name] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.depth[name] -= 1
+        metrics.durations[name] += (time.perf_counter() - started) * 1000
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Обёртка connection.execute_wrapper: считает запросы и их время."""
+    metrics = current()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    metrics.queries += 1
+    with timer('db'):
+        return execute(sql, params, many, context)
+
+
+def record(view_name, metrics, total):
+    values = dict(metrics.durations, total=total, queries=metrics.queries)
+    with _lock:
+        histograms = _histograms.get(view_name)
+        if histograms is None:
+            histograms = _histograms[view_name] = {
+                name: Histogram(
+                    QUERY_BOUNDS if name == 'queries' else TIME_BOUNDS
+                )
+                for name in values
+            }
+        for name, value in values.items():
+            histograms[name].observe(value)
+
+
+def snapshot():
+    with _lock:
+        return {
+            view_name: {
+                name: histogram.as_dict()
+                for name, histogram in histograms.items()
+            }
+            for view_name, histograms in sorted(_histograms.items())
+        }
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
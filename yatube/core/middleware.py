@@ -0,0 +1,67 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics, routers
+
+
+class MetricsMiddleware:
+    """Замеряет запрос и добавляет к ответу заголовок Server-Timing.
+
+    Стоит первым в MIDDLEWARE, чтобы в total попали и остальные
+    промежуточные слои. Для потоковых ответов учитывается только
+    время до начала отдачи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.execute_wrapper)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.finish()
+        total = (time.perf_counter() - started) * 1000
+        response['Server-Timing'] = request_metrics.server_timing(total)
+        match = request.resolver_match
+        if match is not None:
+            metrics.record(match.view_name, request_metrics, total)
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет сеанс за основной базой после записи.
+
+    Запрос без cookie закрепления может читать с реплик, с cookie —
+    только из default. Если запрос что-то записал, cookie ставится
+    заново.
+    """
+
+    cookie_name = 'pin_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset(pinned=self.cookie_name in request.COOKIES)
+        try:
+            response = self.get_response(request)
+            if routers.wrote():
+                response.set_cookie(
+                    self.cookie_name,
+                    '1',
+                    max_age=settings.REPLICA_PIN_SECONDS,
+                    httponly=True,
+                )
+        finally:
+            routers.reset()
+        return response
@@ -0,0 +1,69 @@
+"""Маршрутизация запросов к базе между основной базой и репликами.
+
+Запись всегда идёт в default, чтение — на случайную реплику
+из settings.DATABASE_REPLICAS, но только внутри HTTP-запроса:
+команды, миграции и фоновые потоки работают с default. Запрос,
+который уже писал, дальше читает из default и видит свои изменения.
+Между запросами то же обеспечивает ReplicaPinMiddleware: после записи
+она ставит cookie, и следующие REPLICA_PIN_SECONDS секунд запросы
+сеанса закреплены за default, пока реплики догоняют основную базу.
+
+Сессии и пользователи (PRIMARY_APPS) всегда читаются из default:
+реплика может отставать дольше REPLICA_PIN_SECONDS, и только что
+вошедший пользователь, не найдя на ней свою сессию, оказался бы
+разлогинен.
+"""
+import random
+import threading
+
+from django.conf import settings
+
+PRIMARY = 'default'
+PRIMARY_APPS = {'auth', 'sessions'}
+
+_state = threading.local()
+
+
+def pin():
+    _state.pinned = True
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', True)
+
+
+def wrote():
+    """Была ли запись в этом потоке с последнего reset."""
+    return getattr(_state, 'wrote', False)
+
+
+def note_write():
+    """Отмечает запись в основную базу, сделанную по заданию запроса
+    в другом потоке (posts.comment_queue), как запись самого запроса.
+    """
+    _state.wrote = True
+    pin()
+
+
+def reset(pinned=True):
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or is_pinned():
+            return PRIMARY
+        if model is not None and model._meta.app_label in PRIMARY_APPS:
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        note_write()
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
@@ -0,0 +1,56 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from ..cache import get_or_recompute
+
+
+register = template.Library()
+
+
+class CoalescedCacheNode(template.Node):
+    def __init__(self, nodelist, expire_time, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        try:
+            expire_time = int(self.expire_time.resolve(context))
+        except (template.VariableDoesNotExist, ValueError, TypeError):
+            raise template.TemplateSyntaxError(
+                '"coalesced_cache" tag got an invalid timeout: '
+                f'{self.expire_time.token!r}'
+            )
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = 'coalesced.' + make_template_fragment_key(
+            self.fragment_name, vary_on
+        )
+        return get_or_recompute(
+            key,
+            lambda: self.nodelist.render(context),
+            expire_time,
+        )
+
+
+@register.tag
+def coalesced_cache(parser, token):
+    """Как {% cache %}, но пересчитывает фрагмент в одном процессе.
+
+    {% coalesced_cache [expire_time] [fragment_name] [var1] .. %}
+        ...
+    {% endcoalesced_cache %}
+    """
+    nodelist = parser.parse(('endcoalesced_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.'
+        )
+    return CoalescedCacheNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
@@ -1,3 +1,370 @@
-# from django.test import TestCase
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import Executor, Future
+from contextlib import closing
+from unittest import mock
+from urllib.parse import urlencode
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.signals import request_finished
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections, connection
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, override_settings,
+)
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+from . import metrics, routers
+from .asgi import AsgiHandler
+from .cache import get_or_recompute
+from .management.commands.sync_replicas import copy_database
+from .middleware import ReplicaPinMiddleware
+
+User = get_user_model()
+
+
+class GetOrRecomputeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        time.sleep(0.2)
+        return f'значение {self.calls}'
+
+    def test_cold_cache_is_computed_once(self):
+        """При холодном кеше значение вычисляет только один поток,
+        остальные дожидаются его результата.
+        """
+        results = []
+
+        def worker():
+            results.append(get_or_recompute('key', self.compute, 20))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['значение 1'] * 5)
+
+    def test_stale_value_is_served_during_recompute(self):
+        """Пока значение пересчитывается, отдаётся прежнее."""
+        get_or_recompute('key', self.compute, 20)
+        entry = cache.get('key')
+        cache.set('key', (entry[0], entry[1], time.time() - 1), 40)
+        cache.add('key:lock', 1, 10)
+        self.assertEqual(
+            get_or_recompute('key', self.compute, 20),
+            'значение 1',
+        )
+        self.assertEqual(self.calls, 1)
+        cache.delete('key:lock')
+        self.assertEqual(
+            get_or_recompute('key', self.compute, 20),
+            'значение 2',
+        )
+
+    def test_file_cache_lock_is_atomic(self):
+        """С FileBasedCache замок берётся атомарно, даже если add
+        пропускает все процессы (has_key и set не атомарны)."""
+        with tempfile.TemporaryDirectory() as directory:
+            file_cache = FileBasedCache(directory, {})
+            results = []
+
+            def worker():
+                results.append(get_or_recompute(
+                    'key', self.compute, 20, cache=file_cache
+                ))
+
+            with mock.patch.object(file_cache, 'add', return_value=True):
+                threads = [
+                    threading.Thread(target=worker) for _ in range(5)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['значение 1'] * 5)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_server_timing_header(self):
+        """Ответ несёт Server-Timing с временем БД, шаблонов и всего."""
+        response = self.guest_client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for name in ('db;dur=', 'queries"', 'template;dur=', 'total;dur='):
+            with self.subTest(name=name):
+                self.assertIn(name, timing)
+
+    def test_histograms_by_url_name(self):
+        """Гистограммы копятся по имени URL и видны только персоналу."""
+        for _ in range(3):
+            self.guest_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('core:metrics'))
+        self.assertEqual(response.status_code, 302)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        staff_client = Client()
+        staff_client.force_login(staff)
+        data = staff_client.get(reverse('core:metrics')).json()
+        self.assertEqual(data['posts:index']['total']['count'], 3)
+        self.assertGreater(data['posts:index']['queries']['max'], 0)
+        self.assertIn('p99', data['posts:index']['template'])
+
+    def test_nested_timers_are_not_summed(self):
+        """Вложенный замер той же метрики не учитывается дважды."""
+        request_metrics = metrics.start()
+        with metrics.timer('template'):
+            with metrics.timer('template'):
+                time.sleep(0.05)
+        metrics.finish()
+        self.assertLess(request_metrics.durations['template'], 100)
+
+
+class InlineExecutor(Executor):
+    """Выполняет задачи в вызывающем потоке: внутри TestCase другие
+    потоки не видят данных теста.
+    """
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as error:
+            future.set_exception(error)
+        return future
+
+
+class AsgiHandlerTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание'
+        )
+        for i in range(3):
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {i}'
+            )
+        cls.handler = AsgiHandler(get_wsgi_application(), InlineExecutor())
+
+    def setUp(self):
+        cache.clear()
+        # Как тестовый клиент: закрытие соединения после запроса
+        # оборвало бы транзакцию теста.
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+        client = Client()
+        client.force_login(self.user)
+        self.session = client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def call(self, path, method='GET', query=b'', body=b'', headers=()):
+        scope = {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': query,
+            'headers': [(b'host', b'testserver'), *headers],
+        }
+        messages = []
+        chunks = [body[:10], body[10:]]
+
+        async def receive():
+            chunk = chunks.pop(0)
+            return {
+                'type': 'http.request',
+                'body': chunk,
+                'more_body': bool(chunks),
+            }
+
+        async def send(message):
+            messages.append(message)
+
+        asyncio.run(self.handler(scope, receive, send))
+        return messages
+
+    def cookie(self, **extra):
+        cookies = {settings.SESSION_COOKIE_NAME: self.session, **extra}
+        return (b'cookie', '; '.join(
+            f'{name}={value}' for name, value in cookies.items()
+        ).encode())
+
+    def test_get(self):
+        """GET через ASGI отдаёт ту же страницу, что и WSGI."""
+        start, body = self.call(
+            reverse('posts:search'), query='q=Пост'.encode()
+        )
+        self.assertEqual(start['status'], 200)
+        headers = dict(start['headers'])
+        self.assertIn(b'server-timing', headers)
+        self.assertTrue(headers[b'content-type'].startswith(b'text/html'))
+        self.assertIn('Пост 2', body['body'].decode())
+        self.assertFalse(body.get('more_body'))
+
+    def test_post_body(self):
+        """Тело запроса, пришедшее частями, доходит до формы."""
+        token = 'a' * 32
+        body = urlencode({
+            'text': 'Пост через ASGI',
+            'csrfmiddlewaretoken': token,
+        }).encode()
+        start, _ = self.call(
+            reverse('posts:post_create'),
+            method='POST',
+            body=body,
+            headers=[
+                (b'content-type', b'application/x-www-form-urlencoded'),
+                (b'content-length', str(len(body)).encode()),
+                self.cookie(csrftoken=token),
+            ],
+        )
+        self.assertEqual(start['status'], 302)
+        self.assertTrue(
+            Post.objects.filter(text='Пост через ASGI').exists()
+        )
+
+    def test_streaming_response(self):
+        """Потоковый ответ отдаётся частями."""
+        messages = self.call(
+            reverse('posts:group_export', kwargs={'slug': 'test_slug'}),
+            headers=[self.cookie()],
+        )
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertTrue(all(
+            message['more_body'] for message in messages[1:-1]
+        ))
+        self.assertFalse(messages[-1].get('more_body'))
+        lines = b''.join(
+            message['body'] for message in messages[1:]
+        ).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['text'] for line in lines],
+            ['Пост 0', 'Пост 1', 'Пост 2'],
+        )
+
+    def test_lifespan(self):
+        """Сервер получает подтверждение запуска и остановки."""
+        incoming = [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'},
+        ]
+        sent = []
+
+        async def receive():
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(AsgiHandler(None, InlineExecutor())(
+            {'type': 'lifespan'}, receive, send
+        ))
+        self.assertEqual(sent, [
+            'lifespan.startup.complete', 'lifespan.shutdown.complete',
+        ])
+
+
+class DatabaseTests(SimpleTestCase):
+    databases = {'default'}
+
+    def test_pragmas_on_new_connection(self):
+        """Новое соединение получает PRAGMA из настроек базы."""
+        raw = connection.get_new_connection(
+            connection.get_connection_params()
+        )
+        try:
+            for name, value in (
+                ('synchronous', 1),
+                ('cache_size', -64000),
+                ('temp_store', 2),
+            ):
+                with self.subTest(name=name):
+                    self.assertEqual(
+                        raw.execute(f'PRAGMA {name}').fetchone()[0], value
+                    )
+        finally:
+            raw.close()
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.addCleanup(routers.reset)
+
+    def test_outside_request_uses_primary(self):
+        """Команды и фоновые потоки читают из основной базы."""
+        self.assertEqual(self.router.db_for_read(None), 'default')
+
+    def test_reads_go_to_replica_until_write(self):
+        """Чтение идёт на реплику, а после записи — в основную базу."""
+        routers.reset(pinned=False)
+        self.assertEqual(self.router.db_for_read(None), 'replica_1')
+        self.assertEqual(self.router.db_for_write(None), 'default')
+        self.assertEqual(self.router.db_for_read(None), 'default')
+
+    def test_sessions_and_users_are_read_from_primary(self):
+        """Сессии и пользователи читаются из основной базы даже
+        без закрепления: реплика может ещё не знать о входе."""
+        routers.reset(pinned=False)
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+        self.assertEqual(self.router.db_for_read(User), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'replica_1')
+
+    def test_session_is_pinned_after_write(self):
+        """После записи сеанс закрепляется за основной базой cookie."""
+        reads = []
+
+        def view(request):
+            reads.append(self.router.db_for_read(None))
+            if request.method == 'POST':
+                self.router.db_for_write(None)
+            return HttpResponse()
+
+        middleware = ReplicaPinMiddleware(view)
+        factory = RequestFactory()
+        response = middleware(factory.get('/'))
+        self.assertNotIn('pin_primary', response.cookies)
+        response = middleware(factory.post('/'))
+        self.assertIn('pin_primary', response.cookies)
+        request = factory.get('/')
+        request.COOKIES['pin_primary'] = '1'
+        middleware(request)
+        self.assertEqual(reads, ['replica_1', 'replica_1', 'default'])
+        self.assertTrue(routers.is_pinned())
+
+    def test_copy_database(self):
+        """Замена репликации копирует базу в файл реплики."""
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'primary.sqlite3')
+            target = os.path.join(directory, 'replica.sqlite3')
+            with closing(sqlite3.connect(source)) as db:
+                db.execute('CREATE TABLE post (text TEXT)')
+                db.execute("INSERT INTO post VALUES ('Пост')")
+                db.commit()
+            copy_database(source, target)
+            with closing(sqlite3.connect(target)) as replica:
+                self.assertEqual(
+                    replica.execute('SELECT text FROM post').fetchall(),
+                    [('Пост',)],
+                )
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Post, Group, Follow
 
 
@@ -10,6 +11,16 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search.is_supported(queryset.db):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        if search.match_query(search_term) is None:
+            return queryset, False
+        posts = queryset.filter(pk__in=search.matching_ids(search_term))
+        return posts, False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
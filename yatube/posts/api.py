@@ -0,0 +1,152 @@
+"""JSON API лент и поста только для чтения.
+
+Ответы собираются из values() без создания моделей и без шаблонов.
+Поля выбираются параметром ?fields=id,text,author, страницы —
+курсором ?cursor= как в HTML-лентах.
+"""
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+
+from . import etags
+from .feeds import FollowFeed, FollowFeedPaginator
+from .models import Comment, Group, Post, User
+from .paginators import KeysetPaginator
+from .views import COMMENTS_PER_PAGE, POSTS_PER_PAGE
+
+# Поле ответа -> поле запроса values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'image': 'image',
+    'author': 'author__username',
+    'author_name': 'author__first_name',
+    'group': 'group__slug',
+    'group_title': 'group__title',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+DEFAULT_POST_FIELDS = ('id', 'text', 'pub_date', 'author', 'group')
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def get_fields(request):
+    raw = request.GET.get('fields')
+    if not raw:
+        return DEFAULT_POST_FIELDS
+    fields = tuple(
+        field for field in (part.strip() for part in raw.split(','))
+        if field
+    )
+    unknown = [field for field in fields if field not in POST_FIELDS]
+    if unknown or not fields:
+        raise FieldsError(
+            'Неизвестные поля: {}. Доступны: {}.'.format(
+                ', '.join(unknown), ', '.join(POST_FIELDS)
+            )
+        )
+    return fields
+
+
+def serialize(row, fields, mapping):
+    data = {field: row[mapping[field]] for field in fields}
+    if data.get('image') is not None:
+        data['image'] = (
+            default_storage.url(data['image']) if data['image'] else None
+        )
+    return data
+
+
+def page_response(queryset, cursor, fields, mapping, per_page, keys,
+                  paginator_class=KeysetPaginator):
+    """Страница строк values() с курсорами соседних страниц.
+
+    Ключи сортировки запрашиваются всегда: из них собираются курсоры.
+    """
+    lookups = {mapping[field] for field in fields} | set(keys)
+    paginator = paginator_class(
+        queryset.values(*lookups), per_page, keys=keys
+    )
+    page = paginator.get_page(cursor)
+    return {
+        'results': [serialize(row, fields, mapping) for row in page],
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+    }
+
+
+def feed_response(request, queryset, paginator_class=KeysetPaginator):
+    try:
+        fields = get_fields(request)
+    except FieldsError as error:
+        return JsonResponse({'detail': str(error)}, status=400)
+    return JsonResponse(
+        page_response(
+            queryset,
+            request.GET.get('cursor'),
+            fields,
+            POST_FIELDS,
+            POSTS_PER_PAGE,
+            ('pub_date', 'id'),
+            paginator_class,
+        ),
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+@etags.conditional(etags.index_keys)
+def index(request):
+    return feed_response(request, Post.objects.all())
+
+
+@etags.conditional(etags.group_keys)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, group.posts.all())
+
+
+@etags.conditional(etags.profile_keys)
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, author.posts.all())
+
+
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Требуется авторизация.'}, status=401
+        )
+    return feed_response(
+        request, FollowFeed(request.user), FollowFeedPaginator
+    )
+
+
+@etags.conditional(etags.post_keys)
+def post_detail(request, post_id):
+    try:
+        fields = get_fields(request)
+    except FieldsError as error:
+        return JsonResponse({'detail': str(error)}, status=400)
+    row = get_object_or_404(
+        Post.objects.values(*(POST_FIELDS[field] for field in fields)),
+        pk=post_id,
+    )
+    data = serialize(row, fields, POST_FIELDS)
+    data['comments'] = page_response(
+        Comment.objects.filter(post=post_id),
+        request.GET.get('cursor'),
+        tuple(COMMENT_FIELDS),
+        COMMENT_FIELDS,
+        COMMENTS_PER_PAGE,
+        ('created', 'id'),
+    )
+    return JsonResponse(data, json_dumps_params={'ensure_ascii': False})
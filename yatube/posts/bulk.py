@@ -0,0 +1,36 @@
+"""Помощники массовой загрузки данных в обход сигналов.
+
+bulk_create не отправляет post_save, поэтому после загрузки счётчики,
+ленты подписок и поисковый индекс нужно пересобрать явно.
+"""
+from contextlib import contextmanager
+
+from . import counters, feeds, search
+from .models import Post
+
+
+@contextmanager
+def keep_dates(*fields):
+    """Отключает auto_now_add у полей, чтобы сохранить заданные даты.
+
+    Меняет поля модели на весь процесс, поэтому годится только
+    для команд управления, а не для кода представлений.
+    """
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
+
+
+def rebuild_derived(posts=None):
+    """Пересчитывает счётчики, ленты и индекс после загрузки.
+
+    posts — новые посты для поискового индекса, по умолчанию все.
+    """
+    counters.recount()
+    feeds.rebuild()
+    search.rebuild(Post.objects.all() if posts is None else posts)
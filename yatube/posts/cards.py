@@ -0,0 +1,112 @@
+"""Кеш отрендеренных карточек постов.
+
+Ключ карточки складывается только из данных, которые приходят
+со строкой поста (Post.objects.for_feed()): id, время изменения
+поста, имя файла картинки и имя автора. Поэтому правка поста или
+автора меняет ключ в любом процессе, даже если кеш у каждого воркера
+свой, а устаревшие карточки просто перестают запрашиваться. Карточка
+с заглушкой вместо ещё не готовой миниатюры в кеш не кладётся.
+
+Карточки, которых нет в кеше, по умолчанию (settings.POST_CARDS_COMPILED)
+рисуются одним скомпилированным шаблоном в общем контексте: шаблон
+ищется один раз на страницу, а не на каждую карточку.
+
+Версии в кеше (version_key, bump_version) карточкам не нужны: по ним
+собираются валидаторы условных запросов (etags).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template import Context
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+from . import thumbnails
+
+CARD_TEMPLATE = 'posts/includes/post.html'
+CARD_TIMEOUT = 60 * 60 * 24
+# Миниатюра, которую показывает карточка (см. CARD_TEMPLATE).
+CARD_THUMBNAIL = '100x100'
+
+
+def version_key(kind, pk):
+    return f'post_card_version:{kind}:{pk}'
+
+
+def bump_version(kind, pk):
+    cache.set(version_key(kind, pk), time.time_ns(), None)
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        seed = time.time_ns()
+        for key in missing:
+            cache.add(key, seed, None)
+        versions.update(cache.get_many(missing))
+        for key in missing:
+            versions.setdefault(key, seed)
+    return versions
+
+
+def card_key(post):
+    author = post.author
+    raw = '\x1f'.join([
+        post.image.name or '', author.first_name, author.last_name,
+    ])
+    return 'post_card:{}:{}:{}'.format(
+        post.pk,
+        post.updated_at.timestamp(),
+        hashlib.md5(raw.encode()).hexdigest(),
+    )
+
+
+def is_final(post):
+    """Карточку можно кешировать: картинки нет или миниатюра готова."""
+    return not post.image or thumbnails.ready_thumbnail(
+        post.image, CARD_THUMBNAIL
+    ) is not None
+
+
+def render_cards(posts):
+    """Возвращает пары (пост, html карточки) для страницы ленты.
+
+    Карточки читаются из кеша одним запросом на страницу, шаблон
+    рендерится только для карточек, которых в кеше нет.
+    """
+    posts = list(posts)
+    card_keys = {post.pk: card_key(post) for post in posts}
+    cards = cache.get_many(list(card_keys.values()))
+    missing = [post for post in posts if card_keys[post.pk] not in cards]
+    rendered = dict(zip(
+        [card_keys[post.pk] for post in missing], render_posts(missing)
+    ))
+    cards.update(rendered)
+    final = {
+        card_keys[post.pk]: rendered[card_keys[post.pk]]
+        for post in missing if is_final(post)
+    }
+    if final:
+        cache.set_many(final, CARD_TIMEOUT)
+    return [(post, mark_safe(cards[card_keys[post.pk]])) for post in posts]
+
+
+def render_posts(posts):
+    """HTML карточек постов без кеша."""
+    if not posts:
+        return []
+    if not settings.POST_CARDS_COMPILED:
+        return [
+            render_to_string(CARD_TEMPLATE, {'post': post})
+            for post in posts
+        ]
+    template = get_template(CARD_TEMPLATE).template
+    context = Context(autoescape=template.engine.autoescape)
+    rendered = []
+    for post in posts:
+        with context.push(post=post):
+            rendered.append(template.render(context))
+    return rendered
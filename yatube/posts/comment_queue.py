@@ -0,0 +1,185 @@
+"""Отложенная пакетная запись комментариев (write-behind).
+
+Если settings.COMMENTS_WRITE_MODE = 'batch', add_comment не пишет
+комментарий сам, а ставит его в очередь фонового потока. Поток берёт
+из очереди всё, что пришло за COMMENTS_BATCH_INTERVAL секунд после
+первого комментария (не больше COMMENTS_BATCH_SIZE штук), и сохраняет
+одной транзакцией через bulk_create. Так при всплеске комментариев
+к популярному посту SQLite берёт блокировку записи один раз на пачку,
+а не на каждый комментарий.
+
+bulk_create не отправляет сигналов, поэтому счётчики comments_count
+и версии комментариев (см. signals) поток меняет сам, по разу на пост.
+Запрос ждёт, пока пачка с его комментарием зафиксирована (не дольше
+COMMENTS_BATCH_WAIT секунд), поэтому после редиректа автор видит свой
+комментарий. Очередь у каждого процесса своя. Ошибка пачки достаётся
+только её запросам, а если поток всё же остановился, get_writer
+запускает его заново на той же очереди.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from core import routers
+
+from . import cards, counters
+from .models import Comment
+
+logger = logging.getLogger(__name__)
+
+_writer = None
+_lock = threading.Lock()
+
+
+class CommentWriter:
+    def __init__(self, interval, batch_size):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def is_alive(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name='comments', daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        """Дописывает всё, что уже в очереди, и останавливает поток."""
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def submit(self, comment):
+        """Ставит комментарий в очередь; Future завершится после записи."""
+        future = Future()
+        self.queue.put((comment, future))
+        return future
+
+    def run(self):
+        try:
+            stopped = False
+            while not stopped:
+                batch, stopped = self.collect(self.queue.get())
+                if batch:
+                    self.write_safely(batch)
+        finally:
+            connection.close()
+
+    def collect(self, item):
+        """Пачка из item и того, что придёт за interval после него.
+
+        Возвращает пачку и признак остановки (в очереди встретился None).
+        """
+        batch = []
+        deadline = time.monotonic() + self.interval
+        while item is not None:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, False
+            try:
+                item = self.queue.get(
+                    timeout=max(deadline - time.monotonic(), 0)
+                )
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def write_safely(self, batch):
+        """write без исключений: поток должен пережить любую пачку."""
+        try:
+            self.write(batch)
+        except Exception as error:
+            logger.exception('Не удалось записать пачку комментариев')
+            connection.close_if_unusable_or_obsolete()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+
+    def write(self, batch):
+        comments = [comment for comment, _ in batch]
+        try:
+            with transaction.atomic():
+                Comment.objects.bulk_create(comments)
+                added = Counter(comment.post_id for comment in comments)
+                for post_id, count in added.items():
+                    counters.change_post(post_id, count)
+        except Exception:
+            # Одна плохая запись (например, пост уже удалён) не должна
+            # потерять всю пачку: остальные сохраняются по одной.
+            logger.exception('Не удалось записать пачку комментариев')
+            connection.close_if_unusable_or_obsolete()
+            for comment, future in batch:
+                self.write_one(comment, future)
+            return
+        try:
+            for post_id in added:
+                cards.bump_version('comments', post_id)
+        except Exception:
+            # Комментарии уже зафиксированы: ошибка кеша не делает
+            # запись неудачной.
+            logger.exception('Не удалось обновить версии комментариев')
+        for _, future in batch:
+            future.set_result(True)
+
+    def write_one(self, comment, future):
+        try:
+            with transaction.atomic():
+                comment.save()
+        except Exception as error:
+            future.set_exception(error)
+        else:
+            future.set_result(True)
+
+
+def get_writer():
+    global _writer
+    with _lock:
+        if _writer is None:
+            _writer = CommentWriter(
+                settings.COMMENTS_BATCH_INTERVAL,
+                settings.COMMENTS_BATCH_SIZE,
+            )
+            _writer.start()
+        elif not _writer.is_alive():
+            logger.error('Поток записи комментариев остановился, перезапуск')
+            _writer.start()
+    return _writer
+
+
+@atexit.register
+def shutdown():
+    """Дописывает очередь и останавливает фоновый поток."""
+    global _writer
+    with _lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+
+
+def save(comment):
+    """Сохраняет комментарий сразу или через очередь фонового потока."""
+    if settings.COMMENTS_WRITE_MODE != 'batch':
+        with transaction.atomic():
+            comment.save()
+        return
+    future = get_writer().submit(comment)
+    # Комментарий пишется в основную базу: пусть сеанс читает оттуда.
+    routers.note_write()
+    try:
+        future.result(timeout=settings.COMMENTS_BATCH_WAIT)
+    except TimeoutError:
+        logger.warning(
+            'Комментарий к посту %s ещё ждёт записи', comment.post_id
+        )
@@ -0,0 +1,89 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарно через F()-выражения из сигналов создания
+и удаления объектов. Массовые операции (bulk_create, QuerySet.update)
+сигналов не отправляют; расхождения исправляет recount(), её вызывает
+команда recount_counters.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    change(UserStats.objects.filter(user=user_id), field, delta)
+
+
+def change_post(post_id, delta):
+    change(Post.objects.filter(pk=post_id), 'comments_count', delta)
+
+
+def forget_user(user_id):
+    """Убирает подписки удаляемого пользователя из счётчиков
+    других пользователей.
+
+    Follow.user и Follow.author обнуляются (SET_NULL) одним UPDATE,
+    без сигналов удаления подписок.
+    """
+    follows = Follow.objects.filter(
+        user__isnull=False, author__isnull=False
+    )
+    change(
+        UserStats.objects.filter(
+            user__in=follows.filter(user=user_id).values('author')
+        ),
+        'followers_count',
+        -1,
+    )
+    change(
+        UserStats.objects.filter(
+            user__in=follows.filter(author=user_id).values('user')
+        ),
+        'following_count',
+        -1,
+    )
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0,
+    )
+
+
+def recount():
+    """Пересчитывает все счётчики несколькими UPDATE-запросами."""
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    UserStats.objects.update(
+        posts_count=_count(Post.objects.all(), 'author'),
+        followers_count=_count(
+            Follow.objects.filter(user__isnull=False), 'author'
+        ),
+        following_count=_count(
+            Follow.objects.filter(author__isnull=False), 'user'
+        ),
+    )
+    Post.objects.update(
+        comments_count=_count(Comment.objects.all(), 'post')
+    )
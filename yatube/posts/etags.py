@@ -0,0 +1,146 @@
+"""Валидаторы условных GET-запросов для лент и страницы поста.
+
+ETag и Last-Modified собираются из версий в кеше, как у карточек
+постов (cards.version_key): версия — время последнего изменения
+в наносекундах, её обновляют сигналы. Версии ленты:
+
+* feed:all — изменения, видимые на любой странице (имя автора,
+  название группы);
+* feed:index, feed:group:<id>, feed:author:<id> — посты ленты,
+  а для автора ещё его счётчики и подписки;
+* comments:<id> — комментарии поста;
+* feed:follows:<id> — подписки зрителя: от них зависят кнопки
+  «Подписаться» на любой странице.
+
+Поэтому проверка обходится одним чтением кеша и не больше чем одним
+коротким запросом к базе, а при совпадении view не вызывается вовсе
+и шаблоны не рендерятся. В ETag входит id зрителя: страницы отличаются
+шапкой и кнопками, — а для вошедших ещё ключ сессии: формы страницы
+несут CSRF-токен, при входе он меняется (rotate_token) вместе с ключом
+сессии, и копия со старым токеном не прошла бы проверку CSRF.
+Last-Modified отдаётся только анонимам, иначе после
+входа браузер мог бы получить 304 на копию, сохранённую до входа.
+
+Версии совпадают у всех воркеров, только когда кеш общий
+(settings.CACHE_SHARED). С locmem у каждого процесса свои версии,
+и воркер, не видевший изменения, ответил бы 304 на устаревшую копию,
+поэтому валидаторы не выдаются и страницы всегда отдаются целиком.
+"""
+import datetime
+import hashlib
+import time
+
+from django.conf import settings
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from . import cards
+from .models import Group, Post, User
+
+# Главная кеширует фрагмент ({% coalesced_cache 20 ... %}), а запись
+# живёт в кеше вдвое дольше. Пока фрагмент может быть старше
+# последнего изменения, валидаторы не выдаются.
+INDEX_STALE_WINDOW = 40
+
+
+def feed_key(scope):
+    return cards.version_key('feed', scope)
+
+
+def bump_feeds(*scopes):
+    for scope in scopes:
+        cards.bump_version('feed', scope)
+
+
+def bump_post_feeds(author_id, *group_ids):
+    bump_feeds('index', f'author:{author_id}', *(
+        f'group:{group_id}' for group_id in group_ids if group_id
+    ))
+
+
+def index_keys(request):
+    return [feed_key('all'), feed_key('index')]
+
+
+def group_keys(request, slug):
+    group = Group.objects.filter(slug=slug).values_list('pk', flat=True)
+    group_id = group.first()
+    if group_id is None:
+        return None
+    return [feed_key('all'), feed_key(f'group:{group_id}')]
+
+
+def profile_keys(request, username):
+    author = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    )
+    author_id = author.first()
+    if author_id is None:
+        return None
+    return [feed_key('all'), feed_key(f'author:{author_id}')]
+
+
+def post_keys(request, post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    if post is None:
+        return None
+    author_id, group_id = post
+    return [
+        feed_key('all'),
+        feed_key(f'author:{author_id}'),
+        cards.version_key('post', post_id),
+        cards.version_key('author', author_id),
+        cards.version_key('group', group_id),
+        cards.version_key('comments', post_id),
+    ]
+
+
+def conditional(get_keys, stale_window=0):
+    """Декоратор view: отвечает 304, если страница не менялась.
+
+    get_keys(request, *args, **kwargs) возвращает ключи версий,
+    от которых зависит страница, или None, если проверять нечего
+    (например, объекта нет и view ответит 404). Без общего кеша
+    декоратор ничего не проверяет.
+    """
+
+    def validators(request, *args, **kwargs):
+        if not hasattr(request, '_post_validators'):
+            request._post_validators = None
+            if not settings.CACHE_SHARED:
+                return None
+            keys = get_keys(request, *args, **kwargs)
+            if keys is not None and request.user.is_authenticated:
+                keys = [*keys, feed_key(f'follows:{request.user.pk}')]
+            if keys is not None:
+                versions = cards.get_versions(keys)
+                changed = max(versions.values()) / 1e9
+                if time.time() - changed >= stale_window:
+                    viewer = request.user.pk or 0
+                    raw = '{}:{}:{}:{}'.format(
+                        viewer,
+                        request.session.session_key or '',
+                        request.get_full_path(),
+                        [versions[key] for key in keys],
+                    )
+                    request._post_validators = (
+                        hashlib.md5(raw.encode()).hexdigest(),
+                        datetime.datetime.fromtimestamp(
+                            changed, timezone.utc
+                        ),
+                    )
+        return request._post_validators
+
+    def etag(request, *args, **kwargs):
+        found = validators(request, *args, **kwargs)
+        return found and found[0]
+
+    def last_modified(request, *args, **kwargs):
+        found = validators(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            return None
+        return found and found[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
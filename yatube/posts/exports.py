@@ -0,0 +1,98 @@
+"""Потоковая выгрузка постов с комментариями в NDJSON и CSV.
+
+Посты читаются диапазонами по id: каждый диапазон — отдельный короткий
+запрос «id больше последнего выгруженного», так что память не зависит
+от числа постов, а выгрузка не держит открытую транзакцию или курсор
+между порциями. Комментарии порции подтягиваются одним запросом.
+"""
+import csv
+import json
+
+from .models import Comment
+
+CHUNK_SIZE = 1000
+FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+CSV_FIELDS = (
+    'id', 'pub_date', 'author', 'group', 'text', 'image', 'comments',
+)
+
+
+def iter_chunks(posts, chunk_size=CHUNK_SIZE):
+    """Порции постов из queryset posts по возрастанию id."""
+    posts = posts.select_related('author', 'group').order_by('pk')
+    last = 0
+    while True:
+        chunk = list(
+            posts.filter(pk__gt=last)[:chunk_size].iterator(
+                chunk_size=chunk_size
+            )
+        )
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1].pk
+
+
+def iter_records(posts, image_url=None, chunk_size=CHUNK_SIZE):
+    """Словари постов с комментариями для выгрузки.
+
+    image_url превращает путь картинки в ссылку, например
+    request.build_absolute_uri.
+    """
+    for chunk in iter_chunks(posts, chunk_size):
+        comments = {}
+        for comment in Comment.objects.filter(
+            post__in=[post.pk for post in chunk]
+        ).select_related('author').order_by('post', 'created', 'pk'):
+            comments.setdefault(comment.post_id, []).append({
+                'author': comment.author.username,
+                'text': comment.text,
+                'created': comment.created.isoformat(),
+            })
+        for post in chunk:
+            image = ''
+            if post.image:
+                image = post.image.url
+                if image_url is not None:
+                    image = image_url(image)
+            yield {
+                'id': post.pk,
+                'pub_date': post.pub_date.isoformat(),
+                'author': post.author.username,
+                'group': post.group.slug if post.group else None,
+                'text': post.text,
+                'image': image,
+                'comments': comments.get(post.pk, []),
+            }
+
+
+def ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer, возвращающий строку."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for record in records:
+        record = dict(
+            record,
+            comments=json.dumps(record['comments'], ensure_ascii=False),
+        )
+        yield writer.writerow([record[field] for field in CSV_FIELDS])
+
+
+def lines(records, file_format):
+    if file_format == 'csv':
+        return csv_lines(records)
+    return ndjson_lines(records)
@@ -0,0 +1,307 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост сразу раскладывается в ленты подписчиков автора, поэтому
+страница подписок читает готовый диапазон FeedItem по индексу
+(user, -pub_date, -post). Посты авторов, у которых подписчиков больше
+FEED_FANOUT_MAX_FOLLOWERS, не раскладываются: такие авторы
+подмешиваются в ленту при чтении (fan-out on read), отдельным
+диапазоном по индексу (author, -pub_date) на каждого.
+
+Режим автора хранится в UserStats.fanned_out. Раскладка выключается,
+как только подписчиков больше лимита, а включается снова, только когда
+их осталось не больше FEED_FANOUT_RESUME_RATIO от лимита: тогда ленты
+подписчиков дополняются постами автора одним INSERT ... SELECT вне
+запроса (resume_fan_out). Записи FeedItem, оставшиеся от автора после
+выключения раскладки, при чтении не учитываются.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import FEED_FIELDS, FeedItem, Follow, Post, UserStats
+from .paginators import KeysetPaginator, seek
+
+BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _bulk_create(items):
+    """Вставляет записи ленты пачками, не собирая их все в памяти."""
+    items = iter(items)
+    batch = list(islice(items, BATCH_SIZE))
+    while batch:
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(items, BATCH_SIZE))
+
+
+def fan_out_on_read_authors(user):
+    """Авторы из подписок user, чьи посты читаются без раскладки."""
+    return UserStats.objects.filter(
+        user__following__user=user,
+        fanned_out=False,
+    ).values_list('user', flat=True)
+
+
+def is_fanned_out(author_id):
+    return not UserStats.objects.filter(
+        user=author_id,
+        fanned_out=False,
+    ).exists()
+
+
+def resume_limit():
+    """Число подписчиков, при котором раскладка включается снова."""
+    return int(
+        settings.FEED_FANOUT_MAX_FOLLOWERS
+        * settings.FEED_FANOUT_RESUME_RATIO
+    )
+
+
+class FollowFeed:
+    """Посты ленты подписок user от новых к старым.
+
+    Заменяет QuerySet для Paginator (count и срезы) и для
+    FollowFeedPaginator (range). Каждый источник — FeedItem подписчика
+    и посты каждого автора без раскладки — читается диапазоном
+    по своему индексу не больше чем на нужное число строк, а затем
+    источники сливаются по (pub_date, id). С values(*fields) вместо
+    постов возвращаются словари, как у QuerySet.values().
+    """
+
+    model = Post
+    keys = ('pub_date', 'id')
+
+    def __init__(self, user, fields=None, read_authors=None):
+        self.user = user
+        self.fields = fields
+        if read_authors is None:
+            read_authors = list(fan_out_on_read_authors(user))
+        self.read_authors = read_authors
+
+    def values(self, *fields):
+        return FollowFeed(self.user, fields, self.read_authors)
+
+    def count(self):
+        items = FeedItem.objects.filter(user=self.user)
+        if self.read_authors:
+            items = items.exclude(post__author__in=self.read_authors)
+        count = items.count()
+        if self.read_authors:
+            count += Post.objects.filter(author__in=self.read_authors).count()
+        return count
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('Лента подписок поддерживает только срезы.')
+        if index.stop is None:
+            raise ValueError('Срез ленты подписок должен быть ограничен.')
+        return self.range(None, 'lt', index.stop)[index.start or 0:]
+
+    def items(self):
+        items = FeedItem.objects.filter(user=self.user)
+        if self.fields is None:
+            return items.select_related('post__author', 'post__group').only(
+                'pub_date', *(f'post__{field}' for field in FEED_FIELDS)
+            )
+        return items.values(*(f'post__{field}' for field in self.fields))
+
+    def post(self, item):
+        if self.fields is None:
+            return item.post
+        return {field: item[f'post__{field}'] for field in self.fields}
+
+    def key(self, post):
+        if self.fields is None:
+            return post.pub_date, post.pk
+        return post['pub_date'], post['id']
+
+    def range(self, values, lookup, limit):
+        """До limit постов после ключа (pub_date, id) = values (или
+        с начала ленты): lookup 'lt' — по убыванию, 'gt' — по возрастанию.
+        """
+        prefix = '-' if lookup == 'lt' else ''
+        items = self.items()
+        if values is not None:
+            items = items.filter(seek(('pub_date', 'post_id'), values, lookup))
+        posts = [
+            self.post(item)
+            for item in items.order_by(
+                f'{prefix}pub_date', f'{prefix}post_id'
+            )[:limit]
+        ]
+        for author in self.read_authors:
+            queryset = Post.objects.filter(author=author)
+            if self.fields is None:
+                queryset = queryset.for_feed()
+            else:
+                queryset = queryset.values(*self.fields)
+            if values is not None:
+                queryset = queryset.filter(seek(self.keys, values, lookup))
+            posts.extend(
+                queryset.order_by(f'{prefix}pub_date', f'{prefix}id')[:limit]
+            )
+        # Пост автора, который перестал раскладываться, ещё может
+        # лежать в FeedItem: берём его один раз.
+        unique = {self.key(post): post for post in posts}
+        ordered = sorted(unique, reverse=lookup == 'lt')
+        return [unique[key] for key in ordered[:limit]]
+
+
+class FollowFeedPaginator(KeysetPaginator):
+    """Курсорная пагинация ленты подписок (FollowFeed)."""
+
+    def fetch(self, values, lookup):
+        return self.object_list.range(values, lookup, self.per_page + 1)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if not is_fanned_out(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author=post.author_id,
+        user__isnull=False,
+    ).values_list('user', flat=True)
+    _bulk_create(
+        FeedItem(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора.
+
+    Если с новой подпиской автор превысил лимит, его раскладка
+    выключается, а посты начинают читаться при чтении ленты.
+    """
+    UserStats.objects.filter(
+        user=author_id,
+        fanned_out=True,
+        followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS,
+    ).update(fanned_out=False)
+    if not is_fanned_out(author_id):
+        return
+    posts = Post.objects.filter(
+        author=author_id
+    ).values_list('pk', 'pub_date')
+    _bulk_create(
+        FeedItem(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def purge(user_id, author_id):
+    """Убирает посты автора из ленты подписчика после отписки.
+
+    Если подписчиков у автора без раскладки осталось не больше
+    resume_limit(), раскладка включается снова (schedule_resume).
+    """
+    FeedItem.objects.filter(user=user_id, post__author=author_id).delete()
+    if UserStats.objects.filter(
+        user=author_id,
+        fanned_out=False,
+        followers_count__lte=resume_limit(),
+    ).exists():
+        schedule_resume(author_id)
+
+
+def resume_fan_out(author_id):
+    """Включает раскладку автора и раскладывает его посты по лентам
+    подписчиков одним INSERT ... SELECT.
+
+    Режим меняется в той же транзакции до вставки: посты, созданные
+    после неё, уже раскладываются сигналом. Условие проверяется заново,
+    поэтому повторный или опоздавший вызов ничего не делает.
+    """
+    with transaction.atomic():
+        resumed = UserStats.objects.filter(
+            user=author_id,
+            fanned_out=False,
+            followers_count__lte=resume_limit(),
+        ).update(fanned_out=True)
+        if not resumed:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                connection.ops.insert_statement(ignore_conflicts=True)
+                + f' {FeedItem._meta.db_table} '
+                '(user_id, post_id, pub_date) '
+                'SELECT follow.user_id, post.id, post.pub_date '
+                f'FROM {Follow._meta.db_table} follow '
+                f'JOIN {Post._meta.db_table} post '
+                'ON post.author_id = follow.author_id '
+                'WHERE follow.author_id = %s '
+                'AND follow.user_id IS NOT NULL',
+                [author_id],
+            )
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='feeds',
+            )
+    return _executor
+
+
+def _resume_in_thread(author_id):
+    try:
+        resume_fan_out(author_id)
+    except Exception:
+        logger.exception('Не удалось разложить посты автора %s', author_id)
+    finally:
+        with _lock:
+            _pending.discard(author_id)
+        connection.close()
+
+
+def schedule_resume(author_id):
+    """Ставит включение раскладки автора в очередь (FEED_FANOUT_MODE)."""
+    if settings.FEED_FANOUT_MODE == 'sync':
+        resume_fan_out(author_id)
+        return
+    with _lock:
+        if author_id in _pending:
+            return
+        _pending.add(author_id)
+    get_executor().submit(_resume_in_thread, author_id)
+
+
+def rebuild():
+    """Заново раскладывает все ленты одним INSERT ... SELECT.
+
+    Нужна после массовой загрузки подписок и постов в обход сигналов.
+    Опирается на followers_count, поэтому вызывается после recount().
+    """
+    limit = settings.FEED_FANOUT_MAX_FOLLOWERS
+    UserStats.objects.filter(followers_count__gt=limit).update(
+        fanned_out=False
+    )
+    UserStats.objects.filter(followers_count__lte=limit).update(
+        fanned_out=True
+    )
+    FeedItem.objects.all().delete()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FeedItem._meta.db_table} '
+            '(user_id, post_id, pub_date) '
+            'SELECT follow.user_id, post.id, post.pub_date '
+            f'FROM {Follow._meta.db_table} follow '
+            f'JOIN {Post._meta.db_table} post '
+            'ON post.author_id = follow.author_id '
+            f'JOIN {UserStats._meta.db_table} stats '
+            'ON stats.user_id = follow.author_id '
+            'WHERE follow.user_id IS NOT NULL '
+            'AND stats.fanned_out',
+        )
@@ -0,0 +1,26 @@
+"""Подписки зрителя, загруженные один раз за запрос.
+
+followed_ids(request) одним запросом получает id всех авторов,
+на которых подписан пользователь, и запоминает их в запросе. Кнопки
+подписки у любого числа авторов на странице обходятся этим одним
+запросом. После подписки или отписки в том же запросе набор
+сбрасывается через forget.
+"""
+from .models import Follow
+
+
+def followed_ids(request):
+    if not hasattr(request, '_followed_ids'):
+        ids = frozenset()
+        if request.user.is_authenticated:
+            ids = frozenset(
+                Follow.objects.filter(user=request.user).values_list(
+                    'author_id', flat=True
+                )
+            )
+        request._followed_ids = ids
+    return request._followed_ids
+
+
+def forget(request):
+    request.__dict__.pop('_followed_ids', None)
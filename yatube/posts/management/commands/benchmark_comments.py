@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts import comment_queue
+from posts.models import Comment, Post, User
+
+from .benchmark_views import percentile
+
+MODES = ('sync', 'batch')
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет, сколько комментариев в секунду принимает add_comment, '
+        'когда несколько клиентов одновременно комментируют самый '
+        'популярный пост: с записью в запросе (sync) и через очередь '
+        'фонового писателя (batch). Созданные комментарии удаляются '
+        'в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--clients', type=int, default=8)
+        parser.add_argument(
+            '--mode', choices=MODES, nargs='+', default=list(MODES),
+        )
+        parser.add_argument('--output')
+
+    def handle(self, *args, **options):
+        post = Post.objects.order_by('-comments_count').first()
+        if post is None:
+            raise CommandError('В базе нет постов, запустите seed_data.')
+        users = list(User.objects.order_by('pk')[:options['clients']])
+        url = reverse('posts:add_comment', args=[post.pk])
+        report = {
+            'duration': options['duration'],
+            'clients': len(users),
+            'modes': {},
+        }
+        for mode in options['mode']:
+            with override_settings(COMMENTS_WRITE_MODE=mode):
+                result = self.run(url, users, options['duration'])
+                comment_queue.shutdown()
+            Comment.objects.filter(
+                post=post, text__startswith='Нагрузка'
+            ).delete()
+            report['modes'][mode] = result
+            self.stdout.write(
+                f'{mode}: {result["per_second"]} комментариев/с, '
+                f'p50 {result["p50_ms"]} мс, p99 {result["p99_ms"]} мс, '
+                f'ошибок {result["errors"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def run(self, url, users, duration):
+        clients = []
+        for user in users:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+        timings, errors = [], []
+        deadline = time.monotonic() + duration
+        threads = [
+            threading.Thread(
+                target=self.comment,
+                args=(client, url, deadline, timings, errors),
+            )
+            for client in clients
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        timings = [timing * 1000 for timing in timings]
+        return {
+            'count': len(timings),
+            'per_second': round(len(timings) / duration, 1),
+            'p50_ms': round(percentile(timings, 0.5), 2) if timings else 0,
+            'p99_ms': round(percentile(timings, 0.99), 2) if timings else 0,
+            'errors': len(errors),
+        }
+
+    def comment(self, client, url, deadline, timings, errors):
+        try:
+            number = 0
+            while time.monotonic() < deadline:
+                number += 1
+                started = time.perf_counter()
+                try:
+                    response = client.post(
+                        url, {'text': f'Нагрузка {number}'}
+                    )
+                except Exception as error:
+                    errors.append(error)
+                    continue
+                if response.status_code != 302:
+                    errors.append(response.status_code)
+                    continue
+                timings.append(time.perf_counter() - started)
+        finally:
+            connection.close()
@@ -0,0 +1,165 @@
+import asyncio
+import io
+import itertools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test import Client
+
+from core.asgi import AsgiHandler, ResponseStart, build_environ
+
+from .benchmark_views import Command as BenchmarkViews, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность и p99 лент под растущим числом '
+        'одновременных клиентов: WSGI с фиксированным числом синхронных '
+        'воркеров против ASGI-входа (yatube.asgi). --client-delay '
+        'моделирует медленного клиента: в WSGI отдача ответа держит '
+        'воркер, в ASGI — только корутину.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 4, 16, 64],
+        )
+        parser.add_argument('--wsgi-workers', type=int, default=4)
+        parser.add_argument(
+            '--asgi-threads', type=int, default=settings.ASGI_THREADS,
+        )
+        parser.add_argument(
+            '--client-delay', type=float, default=0,
+            help='Время отдачи ответа клиенту, мс.',
+        )
+        parser.add_argument('--output')
+
+    def handle(self, *args, **options):
+        targets = BenchmarkViews().targets()
+        if not targets:
+            raise CommandError('В базе нет постов, запустите seed_data.')
+        scopes = [self.scope(url, user) for url, user in targets.values()]
+        application = get_wsgi_application()
+        delay = options['client_delay'] / 1000
+        levels = []
+        for concurrency in options['concurrency']:
+            level = {
+                'concurrency': concurrency,
+                'wsgi': self.run_wsgi(
+                    application, scopes, concurrency, options['requests'],
+                    options['wsgi_workers'], delay,
+                ),
+                'asgi': asyncio.run(self.run_asgi(
+                    application, scopes, concurrency, options['requests'],
+                    options['asgi_threads'], delay,
+                )),
+            }
+            levels.append(level)
+            for name in ('wsgi', 'asgi'):
+                result = level[name]
+                self.stdout.write(
+                    f'{name} x{concurrency}: {result["rps"]} запросов/с, '
+                    f'p50 {result["p50_ms"]} мс, p99 {result["p99_ms"]} мс, '
+                    f'ошибок {result["errors"]}'
+                )
+        if options['output']:
+            report = {
+                'requests': options['requests'],
+                'wsgi_workers': options['wsgi_workers'],
+                'asgi_threads': options['asgi_threads'],
+                'client_delay_ms': options['client_delay'],
+                'urls': [url for url, _ in targets.values()],
+                'levels': levels,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def scope(self, url, user):
+        """HTTP-запрос ASGI к url от имени user (или анонима)."""
+        headers = [(b'host', b'localhost')]
+        if user is not None:
+            client = Client()
+            client.force_login(user)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            headers.append((
+                b'cookie',
+                f'{settings.SESSION_COOKIE_NAME}={session}'.encode(),
+            ))
+        return {
+            'type': 'http',
+            'method': 'GET',
+            'path': url,
+            'query_string': b'',
+            'headers': headers,
+        }
+
+    def run_wsgi(self, application, scopes, concurrency, requests,
+                 workers, delay):
+        def serve(scope):
+            start = ResponseStart()
+            response = application(build_environ(scope, io.BytesIO()), start)
+            try:
+                b''.join(response)
+            finally:
+                response.close()
+            time.sleep(delay)
+            return start.status
+
+        with ThreadPoolExecutor(workers) as server, \
+                ThreadPoolExecutor(concurrency) as clients:
+            def request(scope):
+                started = time.perf_counter()
+                status = server.submit(serve, scope).result()
+                return status, time.perf_counter() - started
+
+            started = time.perf_counter()
+            results = list(clients.map(
+                request, itertools.islice(itertools.cycle(scopes), requests)
+            ))
+        return self.summary(results, time.perf_counter() - started)
+
+    async def run_asgi(self, application, scopes, concurrency, requests,
+                       threads, delay):
+        executor = ThreadPoolExecutor(threads, thread_name_prefix='asgi')
+        handler = AsgiHandler(application, executor)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request(scope):
+            response = {}
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    response['status'] = message['status']
+                elif not message.get('more_body'):
+                    await asyncio.sleep(delay)
+
+            async with semaphore:
+                started = time.perf_counter()
+                await handler(scope, receive, send)
+                return response['status'], time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            request(scope)
+            for scope in itertools.islice(itertools.cycle(scopes), requests)
+        ))
+        elapsed = time.perf_counter() - started
+        executor.shutdown()
+        return self.summary(results, elapsed)
+
+    def summary(self, results, elapsed):
+        timings = [duration * 1000 for _, duration in results]
+        return {
+            'rps': round(len(results) / elapsed, 1),
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'errors': sum(status != 200 for status, _ in results),
+        }
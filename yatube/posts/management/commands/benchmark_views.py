@@ -0,0 +1,142 @@
+import json
+import math
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+def percentile(values, q):
+    """Перцентиль по ближайшему рангу."""
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет p50/p99 времени ответа и число SQL-запросов для лент '
+        'и страницы поста через тестовый клиент Django. Результат '
+        'сохраняется в JSON (--output) и сравнивается с прошлым '
+        'прогоном (--compare).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--output')
+        parser.add_argument('--compare')
+        parser.add_argument('--label', default='')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом.',
+        )
+
+    def handle(self, *args, **options):
+        targets = self.targets()
+        if not targets:
+            raise CommandError('В базе нет постов, запустите seed_data.')
+        views = {}
+        for name, (url, user) in targets.items():
+            views[name] = self.measure(
+                url, user, options['requests'], options['cold']
+            )
+            self.stdout.write(
+                f'{name}: p50 {views[name]["p50_ms"]} мс, '
+                f'p99 {views[name]["p99_ms"]} мс, '
+                f'запросов {views[name]["queries"]}'
+            )
+        report = {
+            'label': options['label'],
+            'created': timezone.now().isoformat(),
+            'requests': options['requests'],
+            'cold': options['cold'],
+            'rows': {
+                model._meta.model_name: model.objects.count()
+                for model in (User, Group, Post, Comment, Follow)
+            },
+            'views': views,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.compare(options['compare'], views)
+
+    def targets(self):
+        """URL и пользователь для каждого замеряемого представления."""
+        post = Post.objects.order_by('-comments_count').first()
+        if post is None:
+            return {}
+        targets = {
+            'posts:index': (reverse('posts:index'), None),
+            'posts:post_detail': (
+                reverse('posts:post_detail', args=[post.pk]), None
+            ),
+        }
+        group = Group.objects.annotate(
+            posts_count=Count('posts')
+        ).order_by('-posts_count').first()
+        if group is not None:
+            targets['posts:group_list'] = (
+                reverse('posts:group_list', args=[group.slug]), None
+            )
+        stats = UserStats.objects.select_related('user')
+        author = stats.order_by('-followers_count').first()
+        if author is not None:
+            targets['posts:profile'] = (
+                reverse('posts:profile', args=[author.user.username]), None
+            )
+        reader = stats.order_by('-following_count').first()
+        if reader is not None:
+            targets['posts:follow_index'] = (
+                reverse('posts:follow_index'), reader.user
+            )
+        return targets
+
+    def measure(self, url, user, requests, cold):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        client.get(url)
+        timings = []
+        queries = []
+        for _ in range(requests):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}')
+            queries.append(len(captured))
+        return {
+            'url': url,
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'mean_ms': round(statistics.mean(timings), 2),
+            'queries': max(queries),
+        }
+
+    def compare(self, path, views):
+        with open(path, encoding='utf-8') as file:
+            previous = json.load(file)['views']
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Сравнение с {path}'))
+        for name, result in views.items():
+            before = previous.get(name)
+            if before is None:
+                continue
+            change = (result['p50_ms'] / before['p50_ms'] - 1) * 100
+            self.stdout.write(
+                f'{name}: p50 {before["p50_ms"]} → {result["p50_ms"]} мс '
+                f'({change:+.0f}%), запросов '
+                f'{before["queries"]} → {result["queries"]}'
+            )
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.test import Client
+from django.urls import reverse
+
+from posts.models import Comment, Post, User
+
+from .benchmark_views import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет чтение страниц поста и ленты автора, пока несколько '
+        'потоков непрерывно пишут комментарии. Режим журнала и начала '
+        'транзакций можно переопределить (--journal-mode delete '
+        '--transaction-mode deferred), чтобы сравнить с настройками '
+        'по умолчанию. Созданные комментарии удаляются в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--journal-mode', choices=('wal', 'delete'))
+        parser.add_argument(
+            '--transaction-mode', choices=('immediate', 'deferred'),
+        )
+        parser.add_argument('--output')
+
+    def handle(self, *args, **options):
+        post = Post.objects.select_related('author').order_by(
+            '-comments_count'
+        ).first()
+        if post is None:
+            raise CommandError('В базе нет постов, запустите seed_data.')
+        writers = list(User.objects.order_by('pk')[:options['writers']])
+        settings_dict = connections.databases[connection.alias]
+        if options['journal_mode']:
+            settings_dict['PRAGMAS'] = dict(
+                settings_dict.get('PRAGMAS', {}),
+                journal_mode=options['journal_mode'],
+            )
+        if options['transaction_mode']:
+            settings_dict['TRANSACTION_MODE'] = options['transaction_mode']
+        # Новые PRAGMA и режим транзакций действуют на новые соединения.
+        connection.close()
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+        urls = [
+            reverse('posts:post_detail', args=[post.pk]),
+            reverse('posts:profile', args=[post.author.username]),
+        ]
+        deadline = time.monotonic() + options['duration']
+        reads, writes, created = [], [], []
+        errors = {'read': 0, 'write': 0}
+        threads = [
+            threading.Thread(
+                target=self.read, args=(urls, deadline, reads, errors)
+            )
+            for _ in range(options['readers'])
+        ] + [
+            threading.Thread(
+                target=self.write,
+                args=(post, author, deadline, writes, created, errors),
+            )
+            for author in writers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for start in range(0, len(created), 500):
+            Comment.objects.filter(pk__in=created[start:start + 500]).delete()
+        report = {
+            'journal_mode': journal_mode,
+            'transaction_mode': settings_dict.get(
+                'TRANSACTION_MODE', 'DEFERRED'
+            ),
+            'duration': options['duration'],
+            'readers': options['readers'],
+            'writers': len(writers),
+            'reads': self.summary(reads, options['duration']),
+            'writes': self.summary(writes, options['duration']),
+            'errors': errors,
+        }
+        for name in ('reads', 'writes'):
+            result = report[name]
+            self.stdout.write(
+                f'{name}: {result["per_second"]}/с, '
+                f'p50 {result["p50_ms"]} мс, p99 {result["p99_ms"]} мс, '
+                f'ошибок {errors[name[:-1]]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+    def read(self, urls, deadline, reads, errors):
+        client = Client()
+        try:
+            while time.monotonic() < deadline:
+                for url in urls:
+                    started = time.perf_counter()
+                    try:
+                        response = client.get(url)
+                    except OperationalError:
+                        errors['read'] += 1
+                        continue
+                    if response.status_code != 200:
+                        errors['read'] += 1
+                        continue
+                    reads.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+
+    def write(self, post, author, deadline, writes, created, errors):
+        try:
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        comment = Comment.objects.create(
+                            post=post, author=author, text='Нагрузка'
+                        )
+                except OperationalError:
+                    errors['write'] += 1
+                    continue
+                writes.append(time.perf_counter() - started)
+                created.append(comment.pk)
+        finally:
+            connection.close()
+
+    def summary(self, timings, duration):
+        if not timings:
+            return {'count': 0, 'per_second': 0, 'p50_ms': 0, 'p99_ms': 0}
+        timings = [timing * 1000 for timing in timings]
+        return {
+            'count': len(timings),
+            'per_second': round(len(timings) / duration, 1),
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+        }
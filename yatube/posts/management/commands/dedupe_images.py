@@ -0,0 +1,89 @@
+import os
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails
+from posts.models import Post, StoredImage
+from posts.storage import file_digest
+
+
+class Command(BaseCommand):
+    help = (
+        'Находит одинаковые по содержимому картинки постов, переводит '
+        'посты на одну копию (ту, на которую ссылается самый ранний пост) '
+        'и удаляет остальные вместе с миниатюрами. Заполняет счётчики '
+        'ссылок StoredImage для всех файлов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько места освободится.',
+        )
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        storage = field.storage
+        groups = defaultdict(list)
+        for name in self.walk(storage, field.upload_to.rstrip('/')):
+            with storage.open(name) as content:
+                groups[file_digest(content)].append(name)
+        posts = Post.objects.exclude(image='').order_by().values('image')
+        references = {
+            row['image']: row
+            for row in posts.annotate(count=Count('pk'), first=Min('pk'))
+        }
+        removed = freed = 0
+        for digest, names in groups.items():
+            keep = min(names, key=lambda name: (
+                name not in references,
+                references.get(name, {}).get('first', 0),
+                name,
+            ))
+            duplicates = [name for name in names if name != keep]
+            removed += len(duplicates)
+            freed += sum(storage.size(name) for name in duplicates)
+            if options['dry_run']:
+                continue
+            with transaction.atomic():
+                # updated_at меняет ключ кеша карточек перенесённых постов.
+                Post.objects.filter(image__in=duplicates).update(
+                    image=keep, updated_at=timezone.now()
+                )
+                StoredImage.objects.update_or_create(
+                    digest=digest,
+                    defaults={
+                        'name': keep,
+                        'refcount': sum(
+                            references.get(name, {}).get('count', 0)
+                            for name in names
+                        ),
+                    },
+                )
+            for name in duplicates:
+                delete(ImageFile(name, storage))
+            if duplicates and keep in references:
+                # Миниатюры общей копии и новые валидаторы страниц
+                # перенесённых постов.
+                thumbnails.generate(keep)
+        action = 'Можно удалить' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов: {sum(map(len, groups.values()))}, '
+            f'уникальных: {len(groups)}. {action} копий: {removed}, '
+            f'{freed / 1024 / 1024:.1f} МБ.'
+        ))
+
+    def walk(self, storage, path):
+        if not storage.exists(path):
+            return
+        directories, files = storage.listdir(path)
+        for name in sorted(files):
+            yield os.path.join(path, name)
+        for directory in sorted(directories):
+            yield from self.walk(storage, os.path.join(path, directory))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exports
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты группы или автора вместе с комментариями '
+        'в NDJSON или CSV, читая их порциями по id.'
+    )
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--group', help='slug группы')
+        source.add_argument('--author', help='username автора')
+        parser.add_argument(
+            '--format', choices=tuple(exports.FORMATS), default='ndjson'
+        )
+        parser.add_argument('--output', help='Файл, по умолчанию stdout.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=exports.CHUNK_SIZE
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options['group']:
+                posts = Group.objects.get(slug=options['group']).posts.all()
+            else:
+                posts = User.objects.get(
+                    username=options['author']
+                ).posts.all()
+        except (Group.DoesNotExist, User.DoesNotExist):
+            raise CommandError('Группа или автор не найдены.')
+        records = exports.iter_records(
+            posts, chunk_size=options['chunk_size']
+        )
+        lines = exports.lines(records, options['format'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as file:
+                file.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,170 @@
+import os
+import random
+import tempfile
+import time
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.db.migrations.operations import RemoveConstraint
+from django.db.migrations.state import ProjectState
+
+from core.management.commands.sync_replicas import copy_database
+from posts.bulk import rebuild_derived
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Составные индексы и уникальность подписки, которые снимаются
+# для плана «без индексов».
+COMPOSITE_INDEXES = [
+    (model, index)
+    for model in (Post, Comment)
+    for index in model._meta.indexes
+]
+CONSTRAINTS = [(Follow, constraint) for constraint in Follow._meta.constraints]
+# Псевдоним временной копии базы, на которой снимаются индексы.
+SCRATCH = 'feed_query_plans'
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает планы и время горячих запросов лент с составными '
+        'индексами и без них. Оба плана снимаются на временной копии '
+        'базы, рабочая схема не меняется. С --seed сначала добавляет '
+        'в базу указанное число постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+        queries = self.hot_queries()
+        if not queries:
+            self.stderr.write('В базе нет постов, запустите с --seed.')
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, 'db.sqlite3')
+            copy_database(connection.settings_dict['NAME'], target)
+            connections.databases[SCRATCH] = {
+                **connection.settings_dict, 'NAME': target,
+            }
+            try:
+                self.compare(connections[SCRATCH], queries, options['repeat'])
+            finally:
+                connections[SCRATCH].close()
+                del connections[SCRATCH]
+                del connections.databases[SCRATCH]
+
+    def compare(self, scratch, queries, repeat):
+        """Планы на копии базы scratch с индексами и без них."""
+        queries = {
+            name: queryset.using(scratch.alias)
+            for name, queryset in queries.items()
+        }
+        self.report(scratch, 'С составными индексами', queries, repeat)
+        # В SQLite уникальность подписки снимается только пересозданием
+        # таблицы, а таблица пересоздаётся по модели: берём модель
+        # из состояния, где ограничения уже нет, как это делает
+        # миграция RemoveConstraint.
+        state = ProjectState.from_apps(apps)
+        for model, constraint in CONSTRAINTS:
+            RemoveConstraint(
+                model._meta.model_name, constraint.name
+            ).state_forwards(model._meta.app_label, state)
+        with scratch.schema_editor() as editor:
+            for model, index in COMPOSITE_INDEXES:
+                editor.remove_index(model, index)
+            for model, constraint in CONSTRAINTS:
+                editor.remove_constraint(
+                    state.apps.get_model(model._meta.label), constraint
+                )
+        self.report(scratch, 'Без составных индексов', queries, repeat)
+
+    def seed(self, num):
+        authors = [
+            User.objects.get_or_create(username=f'bench_author_{i}')[0]
+            for i in range(100)
+        ]
+        groups = [
+            Group.objects.get_or_create(
+                slug=f'bench_group_{i}',
+                defaults={'title': f'Группа {i}', 'description': '-'},
+            )[0]
+            for i in range(20)
+        ]
+        reader = User.objects.get_or_create(username='bench_reader')[0]
+        for author in authors[:10]:
+            Follow.objects.get_or_create(user=reader, author=author)
+        first_post = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        for start in range(0, num, BATCH_SIZE):
+            with transaction.atomic():
+                Post.objects.bulk_create([
+                    Post(
+                        author=random.choice(authors),
+                        group=random.choice(groups + [None]),
+                        text=f'Пост {start + i}',
+                    )
+                    for i in range(min(BATCH_SIZE, num - start))
+                ])
+            self.stdout.write(
+                f'Добавлено постов: {min(start + BATCH_SIZE, num)}'
+            )
+        post = Post.objects.filter(author=authors[0]).first()
+        Comment.objects.bulk_create([
+            Comment(author=reader, post=post, text=f'Коммент {i}')
+            for i in range(1000)
+        ])
+        # bulk_create обходит сигналы: счётчики, ленты подписок
+        # и поисковый индекс пересобираются, как после seed_data.
+        self.stdout.write('Пересчёт счётчиков, лент и поискового индекса')
+        with transaction.atomic():
+            rebuild_derived(Post.objects.filter(pk__gt=first_post))
+
+    def hot_queries(self):
+        post = Post.objects.filter(group__isnull=False).first()
+        follow = Follow.objects.filter(
+            user__isnull=False,
+            author__isnull=False,
+        ).first()
+        if post is None:
+            return {}
+        queries = {
+            'group_posts': Post.objects.for_feed().filter(
+                group=post.group_id)[:10],
+            'profile': Post.objects.for_feed().filter(
+                author=post.author_id)[:10],
+            'post_comments': Comment.objects.filter(post=post)[:10],
+        }
+        if follow is not None:
+            queries['profile_following'] = Follow.objects.filter(
+                user=follow.user_id,
+                author=follow.author_id,
+            )
+        return queries
+
+    def report(self, scratch, title, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in queries.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            self.stdout.write(f'{name}: {elapsed:.2f} мс')
+            for line in self.explain(scratch, queryset, title):
+                self.stdout.write(f'    {line}')
+
+    def explain(self, scratch, queryset, title):
+        # Модуль sqlite3 кеширует подготовленные запросы по тексту SQL,
+        # и после DROP INDEX повторный EXPLAIN показал бы старый план.
+        sql, params = queryset.query.sql_with_params()
+        with scratch.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql} -- {title}', params)
+            return [row[-1] for row in cursor.fetchall()]
@@ -0,0 +1,173 @@
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import File
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_image_file_extension
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import keep_dates, rebuild_derived
+from posts.forms import PostForm
+from posts.models import Group, Post, User
+
+CHUNK_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты из JSONL или CSV (поля text, author, group, '
+        'pub_date, image). Строки читаются потоком, проверяются по '
+        'правилам PostForm и вставляются через bulk_create пачками, '
+        'каждая в своей транзакции. Авторы и группы ищутся по username '
+        'и slug в словарях, загруженных заранее.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл или - для stdin.')
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Не пересчитывать счётчики, ленты и индекс после загрузки.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format']
+        if file_format is None:
+            extension = os.path.splitext(path)[1].lower()
+            file_format = 'csv' if extension == '.csv' else 'jsonl'
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.text_field = PostForm.base_fields['text']
+        self.now = timezone.now()
+        self.errors = 0
+        self.imported = 0
+        before = Post.objects.aggregate(pk=Max('pk'))['pk'] or 0
+        try:
+            if path == '-':
+                self.load(sys.stdin, file_format, options)
+            else:
+                with open(path, encoding='utf-8', newline='') as file:
+                    self.load(file, file_format, options)
+        finally:
+            # Пачки, записанные до ошибки, уже в базе: без пересчёта
+            # счётчики, ленты и индекс разошлись бы с ними.
+            if self.imported and not options['no_rebuild']:
+                self.stdout.write(
+                    'Пересчёт счётчиков, лент и поискового индекса'
+                )
+                with transaction.atomic():
+                    rebuild_derived(Post.objects.filter(pk__gt=before))
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено постов: {self.imported}, '
+            f'пропущено строк: {self.errors}'
+        ))
+
+    def load(self, file, file_format, options):
+        rows = (
+            self.read_csv(file) if file_format == 'csv'
+            else self.read_jsonl(file)
+        )
+        posts = self.clean_rows(rows)
+        started = time.perf_counter()
+        with keep_dates(Post._meta.get_field('pub_date')):
+            batch = list(itertools.islice(posts, options['chunk_size']))
+            while batch:
+                with transaction.atomic():
+                    Post.objects.bulk_create(batch)
+                self.imported += len(batch)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'Загружено {self.imported} '
+                    f'({self.imported / elapsed:.0f} строк/с)'
+                )
+                batch = list(itertools.islice(posts, options['chunk_size']))
+
+    def read_jsonl(self, file):
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                self.skip(line_number, error)
+                continue
+            if not isinstance(row, dict):
+                self.skip(line_number, 'ожидался JSON-объект')
+                continue
+            yield line_number, row
+
+    def read_csv(self, file):
+        reader = csv.DictReader(file)
+        if reader.fieldnames is None or 'text' not in reader.fieldnames:
+            raise CommandError('В заголовке CSV нет колонки text.')
+        for row in reader:
+            yield reader.line_num, row
+
+    def clean_rows(self, rows):
+        for line_number, row in rows:
+            try:
+                yield self.clean(row)
+            except ValidationError as error:
+                self.skip(line_number, '; '.join(error.messages))
+
+    def string(self, row, field):
+        """Строковое поле строки, None или ValidationError.
+
+        В JSONL поле может оказаться числом, списком или объектом.
+        """
+        value = row.get(field)
+        if value is not None and not isinstance(value, str):
+            raise ValidationError(
+                f'Поле {field} должно быть строкой, '
+                f'а не {type(value).__name__}.'
+            )
+        return value
+
+    def clean(self, row):
+        """Пост из строки по правилам PostForm или ValidationError."""
+        text = self.text_field.clean(self.string(row, 'text'))
+        username = self.string(row, 'author')
+        author = self.authors.get(username)
+        if author is None:
+            raise ValidationError(f'Нет автора {username!r}.')
+        group = None
+        slug = self.string(row, 'group')
+        if slug:
+            group = self.groups.get(slug)
+            if group is None:
+                raise ValidationError(f'Нет группы {slug!r}.')
+        pub_date = self.now
+        raw_date = self.string(row, 'pub_date')
+        if raw_date:
+            try:
+                pub_date = parse_datetime(raw_date)
+            except ValueError:
+                pub_date = None
+            if pub_date is None:
+                raise ValidationError(f'Неверная дата {raw_date!r}.')
+            if timezone.is_naive(pub_date):
+                pub_date = timezone.make_aware(pub_date)
+        image = self.string(row, 'image') or ''
+        if image:
+            validate_image_file_extension(File(None, name=image))
+        return Post(
+            text=text,
+            author_id=author,
+            group_id=group,
+            pub_date=pub_date,
+            image=image,
+        )
+
+    def skip(self, line_number, error):
+        self.errors += 1
+        self.stderr.write(f'Строка {line_number}: {error}')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит поисковый индекс постов, например после '
+        'загрузки данных в обход сигналов.'
+    )
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stderr.write('Поисковый индекс есть только в SQLite.')
+            return
+        with transaction.atomic():
+            search.clear()
+            total = search.rebuild(Post.objects.all())
+        self.stdout.write(
+            self.style.SUCCESS(f'Проиндексировано постов: {total}')
+        )
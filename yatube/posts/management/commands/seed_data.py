@@ -0,0 +1,212 @@
+import bisect
+import datetime
+import itertools
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from posts.bulk import keep_dates, rebuild_derived
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+CHUNK_SIZE = 10000
+WORDS = (
+    'котик собака утро вечер город море лес дорога книга музыка кино '
+    'работа отпуск дождь солнце зима лето друзья семья кофе чай поезд '
+    'самолёт фотография прогулка горы река праздник новости погода '
+    'спорт футбол концерт выставка рецепт ужин завтрак школа проект'
+).split()
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Лев', 'Вера', '')
+
+
+class ZipfChoice:
+    """Случайный выбор из items с весами 1 / rank ** alpha.
+
+    Первые элементы выбираются намного чаще остальных: так получаются
+    популярные авторы с тысячами подписчиков и длинный хвост
+    пользователей, на которых почти никто не подписан.
+    """
+
+    def __init__(self, items, alpha, rng):
+        self.items = items
+        self.rng = rng
+        self.cum_weights = list(itertools.accumulate(
+            1 / rank ** alpha for rank in range(1, len(items) + 1)
+        ))
+
+    def __call__(self):
+        point = self.rng.random() * self.cum_weights[-1]
+        return self.items[bisect.bisect(self.cum_weights, point)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу правдоподобными данными для нагрузочных тестов: '
+        'пользователи, группы, посты, комментарии и подписки со степенным '
+        'распределением подписчиков. Масштаб задаётся опциями, миллионы '
+        'строк вставляются пачками через bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--follows', type=int, default=20,
+            help='Среднее число подписок на пользователя.',
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степенного распределения популярности.',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--random-seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['random_seed'])
+        self.now = timezone.now()
+        self.days = options['days']
+        started = time.perf_counter()
+        users = self.create_users(options['users'])
+        if not users:
+            self.stderr.write('Нужен хотя бы один пользователь.')
+            return
+        groups = self.create_groups(options['groups'])
+        # Популярность и активность распределены степенно, но
+        # независимо: самые читаемые авторы не обязательно пишут больше
+        # всех, иначе раскладка лент росла бы как их произведение.
+        self.rng.shuffle(users)
+        popular_user = ZipfChoice(users, options['alpha'], self.rng)
+        active_user = ZipfChoice(
+            self.rng.sample(users, len(users)), options['alpha'], self.rng
+        )
+        self.create_follows(users, popular_user, options['follows'])
+        posts = self.create_posts(options['posts'], active_user, groups)
+        if posts:
+            popular_post = ZipfChoice(posts, options['alpha'], self.rng)
+            self.create_comments(
+                options['comments'], users, popular_post
+            )
+        new_posts = Post.objects.none()
+        if posts:
+            new_posts = Post.objects.filter(pk__gte=min(posts))
+        self.stdout.write('Пересчёт счётчиков, лент и поискового индекса')
+        with transaction.atomic():
+            rebuild_derived(new_posts)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - started:.1f} с'
+        ))
+
+    def random_date(self):
+        return self.now - datetime.timedelta(
+            seconds=self.rng.randrange(self.days * 86400)
+        )
+
+    def text(self, words):
+        return ' '.join(self.rng.choices(WORDS, k=words)).capitalize()
+
+    def bulk_create(self, model, objects, total, **kwargs):
+        """Вставляет объекты пачками по CHUNK_SIZE, каждую в транзакции,
+        и возвращает id новых строк.
+        """
+        before = model.objects.aggregate(pk=Max('pk'))['pk'] or 0
+        objects = iter(objects)
+        done = 0
+        batch = list(itertools.islice(objects, CHUNK_SIZE))
+        while batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+            done += len(batch)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: {done} из {total}'
+            )
+            batch = list(itertools.islice(objects, CHUNK_SIZE))
+        return list(
+            model.objects.filter(pk__gt=before).values_list('pk', flat=True)
+        )
+
+    def create_users(self, num):
+        start = User.objects.aggregate(pk=Max('pk'))['pk'] or 0
+        password = make_password(None)
+        return self.bulk_create(
+            User,
+            (
+                User(
+                    username=f'seed_user_{start + i}',
+                    first_name=self.rng.choice(FIRST_NAMES),
+                    password=password,
+                    date_joined=self.now,
+                )
+                for i in range(num)
+            ),
+            num,
+        )
+
+    def create_groups(self, num):
+        start = Group.objects.aggregate(pk=Max('pk'))['pk'] or 0
+        return self.bulk_create(
+            Group,
+            (
+                Group(
+                    title=f'Группа {start + i}',
+                    slug=f'seed-group-{start + i}',
+                    description=self.text(10),
+                )
+                for i in range(num)
+            ),
+            num,
+        )
+
+    def create_follows(self, users, popular_user, average):
+        def follows():
+            for user in users:
+                count = self.rng.randint(0, average * 2)
+                authors = {popular_user() for _ in range(count)}
+                authors.discard(user)
+                for author in authors:
+                    yield Follow(user_id=user, author_id=author)
+
+        self.bulk_create(
+            Follow, follows(), len(users) * average, ignore_conflicts=True
+        )
+
+    def create_posts(self, num, active_user, groups):
+        groups = groups + [None]
+        with keep_dates(Post._meta.get_field('pub_date')):
+            return self.bulk_create(
+                Post,
+                (
+                    Post(
+                        author_id=active_user(),
+                        group_id=self.rng.choice(groups),
+                        text=self.text(self.rng.randint(3, 40)),
+                        pub_date=self.random_date(),
+                    )
+                    for _ in range(num)
+                ),
+                num,
+            )
+
+    def create_comments(self, num, users, popular_post):
+        with keep_dates(Comment._meta.get_field('created')):
+            self.bulk_create(
+                Comment,
+                (
+                    Comment(
+                        author_id=self.rng.choice(users),
+                        post_id=popular_post(),
+                        text=self.text(self.rng.randint(1, 15)),
+                        created=self.random_date(),
+                    )
+                    for _ in range(num)
+                ),
+                num,
+            )
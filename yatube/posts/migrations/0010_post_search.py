@@ -0,0 +1,50 @@
+from itertools import islice
+
+from django.db import migrations
+
+from posts.stemmer import index_text
+
+# Копия схемы индекса из posts.search на момент миграции: модуль поиска
+# импортирует текущие модели и может измениться.
+TABLE = 'posts_post_search'
+BATCH_SIZE = 1000
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5('
+        f"text, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.using(schema_editor.connection.alias)
+    rows = (
+        (pk, index_text(text))
+        for pk, text in posts.values_list('pk', 'text').iterator()
+    )
+    with schema_editor.connection.cursor() as cursor:
+        batch = list(islice(rows, BATCH_SIZE))
+        while batch:
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+                batch,
+            )
+            batch = list(islice(rows, BATCH_SIZE))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
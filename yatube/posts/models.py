@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import DedupImageStorage
+
 User = get_user_model()
 
 
@@ -13,6 +15,26 @@ class Group(models.Model):
         return self.title
 
 
+# Поля поста, автора и группы, нужные карточке ленты.
+FEED_FIELDS = (
+    'text',
+    'pub_date',
+    'updated_at',
+    'image',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__title',
+    'group__slug',
+)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для карточек ленты с автором и группой одним запросом."""
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст поста',
@@ -41,13 +63,34 @@ class Post(models.Model):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=DedupImageStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Число комментариев',
+        default=0,
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['group', '-pub_date'],
+                name='posts_post_group_pub_date_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='posts_post_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -80,6 +123,12 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Коммент'
         verbose_name_plural = 'Комменты'
+        indexes = [
+            models.Index(
+                fields=['post', '-created'],
+                name='posts_comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -106,6 +155,116 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='posts_follow_unique_user_author',
+            ),
+        ]
 
     def __str__(self):
         return f'Подписка {self.user} на {self.author}'
+
+
+class FeedItem(models.Model):
+    """Пост в материализованной ленте подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        indexes = [
+            # post замыкает ключ курсора (pub_date, post_id): страница
+            # читается по индексу без досортировки постов с равной датой.
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='posts_feed_user_pub_post_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='posts_feed_unique_user_post',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.post} в ленте {self.user}'
+
+
+class UserStats(models.Model):
+    """Поддерживаемые счётчики пользователя."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число постов',
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Число подписок',
+        default=0,
+    )
+    # Посты раскладываются по лентам подписчиков (posts.feeds).
+    fanned_out = models.BooleanField(
+        verbose_name='Раскладка по лентам',
+        default=True,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class StoredImage(models.Model):
+    """Файл картинки, общий для постов с одинаковой картинкой."""
+
+    digest = models.CharField(
+        verbose_name='SHA-256 содержимого',
+        max_length=64,
+        unique=True,
+    )
+    name = models.CharField(
+        verbose_name='Файл',
+        max_length=255,
+        db_index=True,
+    )
+    refcount = models.PositiveIntegerField(
+        verbose_name='Число постов',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Картинка'
+        verbose_name_plural = 'Картинки'
+
+    def __str__(self):
+        return self.name
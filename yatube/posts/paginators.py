@@ -0,0 +1,239 @@
+import base64
+import binascii
+import collections.abc
+import datetime
+import json
+import time
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import cards, etags
+
+# Номера страниц по обе стороны от текущей в переключателе.
+PAGE_WINDOW = 2
+# Целые, которые помещаются в INTEGER базы (64 бита со знаком).
+DB_INTEGER_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def seek(keys, values, lookup):
+    """Условие «ключи (keys) после values» в порядке сортировки:
+    lookup 'lt' — при обходе по убыванию, 'gt' — по возрастанию.
+    """
+    conditions = []
+    for i, key in enumerate(keys):
+        condition = dict(zip(keys[:i], values[:i]))
+        condition[f'{key}__{lookup}'] = values[i]
+        conditions.append(Q(**condition))
+    return reduce(or_, conditions)
+
+
+class KeysetPage(collections.abc.Sequence):
+    """Страница ленты, отобранная по курсору, а не по номеру страницы."""
+
+    is_keyset = True
+
+    def __init__(self, object_list, cursor, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<KeysetPage {self.cursor or "first"}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def is_cursor_value(value):
+    """Значение ключа, по которому можно фильтровать: не None, целое
+    в пределах INTEGER базы, дата — с часовым поясом."""
+    if value is None:
+        return False
+    if isinstance(value, int):
+        return value in DB_INTEGER_RANGE
+    if isinstance(value, datetime.datetime):
+        return timezone.is_aware(value)
+    return True
+
+
+class KeysetPaginator:
+    """Пагинация по ключу сортировки (seek-метод).
+
+    Вместо COUNT(*) и OFFSET страница выбирается условием
+    «(pub_date, id) меньше, чем у последнего поста предыдущей страницы»,
+    поэтому стоимость запроса не зависит ни от размера таблицы,
+    ни от глубины страницы. Ключи сортируются по убыванию.
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id')):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.keys = tuple(keys)
+
+    def encode_cursor(self, obj, direction):
+        values = []
+        for key in self.keys:
+            value = (
+                obj[key] if isinstance(obj, dict) else getattr(obj, key)
+            )
+            if isinstance(value, datetime.datetime):
+                value = value.isoformat()
+            values.append(value)
+        raw = json.dumps([direction, values]).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, значения ключей) или None."""
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode())
+            direction, values = json.loads(raw.decode())
+        except (binascii.Error, UnicodeError, ValueError, TypeError):
+            return None
+        if direction not in ('next', 'prev') or not isinstance(
+                values, list) or len(values) != len(self.keys):
+            return None
+        try:
+            values = [
+                self.to_python(key, value)
+                for key, value in zip(self.keys, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            return None
+        if not all(map(is_cursor_value, values)):
+            return None
+        return direction, values
+
+    def to_python(self, key, value):
+        field = self.object_list.model._meta.get_field(key)
+        return field.to_python(value)
+
+    def fetch(self, values, lookup):
+        """До per_page + 1 объектов после ключа values (или с начала
+        ленты, если values — None) в порядке обхода: lookup 'lt' —
+        по убыванию ключей, 'gt' — по возрастанию.
+        """
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(seek(self.keys, values, lookup))
+        prefix = '-' if lookup == 'lt' else ''
+        ordering = [prefix + key for key in self.keys]
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    def get_page(self, cursor):
+        """Возвращает страницу по курсору.
+
+        Неверный или пустой курсор означает первую страницу.
+        """
+        decoded = self.decode_cursor(cursor)
+        if decoded is None:
+            cursor = ''
+            rows = self.fetch(None, 'lt')
+            has_next = len(rows) > self.per_page
+            has_previous = False
+            rows = rows[:self.per_page]
+        elif decoded[0] == 'next':
+            rows = self.fetch(decoded[1], 'lt')
+            has_next = len(rows) > self.per_page
+            has_previous = True
+            rows = rows[:self.per_page]
+        else:
+            rows = self.fetch(decoded[1], 'gt')
+            has_next = True
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+        return KeysetPage(
+            rows,
+            cursor,
+            self.encode_cursor(rows[-1], 'next')
+            if rows and has_next else None,
+            self.encode_cursor(rows[0], 'prev')
+            if rows and has_previous else None,
+        )
+
+
+def page_window(page):
+    """Номера страниц для переключателя: первая, последняя
+    и PAGE_WINDOW по обе стороны от текущей, None — пропуск.
+
+    В отличие от paginator.page_range не зависит от числа страниц.
+    """
+    last = page.paginator.num_pages
+    numbers = sorted({1, last} | set(range(
+        max(1, page.number - PAGE_WINDOW),
+        min(last, page.number + PAGE_WINDOW) + 1,
+    )))
+    window = []
+    for number in numbers:
+        if window and number - window[-1] > 1:
+            window.append(None)
+        window.append(number)
+    return window
+
+
+class FeedPaginator(Paginator):
+    """Paginator с заранее известным числом объектов.
+
+    count — число или функция без аргументов, тогда COUNT(*) не
+    выполняется.
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._known_count = count
+
+    @cached_property
+    def count(self):
+        if self._known_count is None:
+            return super().count
+        if callable(self._known_count):
+            return self._known_count()
+        return self._known_count
+
+
+def feed_count(scope, queryset):
+    """Число постов ленты etags.feed_key(scope) из кеша.
+
+    Значение привязано к версии ленты, которую меняют сигналы постов,
+    поэтому COUNT(*) выполняется один раз после изменения. Если лента
+    меняется часто, прежнее число отдаётся ещё FEED_COUNT_STALE_SECONDS
+    секунд после подсчёта: номера страниц могут немного отставать.
+    Без общего кеша (settings.CACHE_SHARED) версия в процессе может
+    не знать о чужих изменениях, и число всегда живёт только
+    FEED_COUNT_STALE_SECONDS секунд.
+    """
+    version_key = etags.feed_key(scope)
+    version = cards.get_versions([version_key])[version_key]
+    key = f'feed_count:{scope}'
+    cached = cache.get(key)
+    now = time.time()
+    if cached is not None:
+        cached_version, count, counted_at = cached
+        if (cached_version == version and settings.CACHE_SHARED
+                or now - counted_at < settings.FEED_COUNT_STALE_SECONDS):
+            return count
+    count = queryset.count()
+    cache.set(key, (version, count, now), None)
+    return count
@@ -0,0 +1,193 @@
+"""Полнотекстовый поиск по постам.
+
+Обратный индекс хранится в виртуальной таблице SQLite FTS5
+posts_post_search: rowid совпадает с id поста, а в колонке text лежат
+основы слов поста. У FTS5 нет русского стеммера, поэтому текст
+и запрос приводятся к основам упрощённым алгоритмом Портера (Snowball)
+для русского языка из posts.stemmer. Индекс обновляется сигналами
+при сохранении и удалении поста; после bulk_create и загрузки данных
+в обход ORM его пересобирает команда rebuild_search_index.
+
+На других СУБД поиск откатывается к icontains по тексту поста.
+"""
+from itertools import islice
+
+from django.db import connection, connections
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .paginators import KeysetPage, KeysetPaginator
+from .stemmer import WORD, index_text, stems
+
+TABLE = 'posts_post_search'
+BATCH_SIZE = 1000
+
+
+def match_query(text):
+    """Запрос FTS5: все основы слов text, или None для пустого запроса."""
+    words = stems(text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def is_supported(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def index_post(post):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, index_text(post.text)],
+        )
+
+
+def remove_post(post_id):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def clear(using='default'):
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+
+
+def rebuild(posts):
+    """Заново индексирует посты из queryset posts.
+
+    Записи индекса остальных постов не трогаются, так что после
+    загрузки данных достаточно передать только новые посты.
+    """
+    if not is_supported(posts.db):
+        return 0
+    rows = (
+        (pk, index_text(text))
+        for pk, text in posts.values_list('pk', 'text').iterator()
+    )
+    total = 0
+    with connections[posts.db].cursor() as cursor:
+        batch = list(islice(rows, BATCH_SIZE))
+        while batch:
+            cursor.executemany(
+                f'DELETE FROM {TABLE} WHERE rowid = %s',
+                [(pk,) for pk, _ in batch],
+            )
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+                batch,
+            )
+            total += len(batch)
+            batch = list(islice(rows, BATCH_SIZE))
+    return total
+
+
+class Subquery(RawSQL):
+    """Сырой подзапрос для pk__in.
+
+    RawSQL оборачивает SQL в скобки, и вместе со скобками IN
+    получилось бы IN ((SELECT ...)): SQLite считает такой подзапрос
+    скалярным и берёт только первую строку.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def matching_ids(text):
+    """Подзапрос id постов, подходящих под запрос text."""
+    return Subquery(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s',
+        [match_query(text)],
+    )
+
+
+class SearchPaginator(KeysetPaginator):
+    """Курсорная пагинация результатов поиска по релевантности.
+
+    Посты упорядочены по bm25 (чем меньше, тем релевантнее), при равном
+    ранге — по id. Курсор хранит (rank, id) крайнего поста страницы.
+    """
+
+    def __init__(self, query, per_page):
+        super().__init__(Post.objects.for_feed(), per_page, ('rank', 'id'))
+        self.query = query
+
+    def to_python(self, key, value):
+        if key == 'rank':
+            return float(value)
+        return super().to_python(key, value)
+
+    def fetch(self, match, decoded):
+        sql = f'SELECT rowid, rank FROM {TABLE} WHERE {TABLE} MATCH %s'
+        params = [match]
+        if decoded is None:
+            order = 'rank, rowid'
+        else:
+            direction, (rank, pk) = decoded
+            lookup, order = (
+                ('>', 'rank, rowid') if direction == 'next'
+                else ('<', 'rank DESC, rowid DESC')
+            )
+            sql += (
+                f' AND (rank {lookup} %s'
+                f' OR (rank = %s AND rowid {lookup} %s))'
+            )
+            params += [rank, rank, pk]
+        sql += f' ORDER BY {order} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def get_page(self, cursor):
+        match = match_query(self.query)
+        if match is None:
+            return KeysetPage([], '', None, None)
+        decoded = self.decode_cursor(cursor)
+        rows = self.fetch(match, decoded)
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if decoded is None:
+            cursor = ''
+            has_next, has_previous = more, False
+        elif decoded[0] == 'next':
+            has_next, has_previous = more, True
+        else:
+            has_next, has_previous = True, more
+            rows = rows[::-1]
+        posts = self.object_list.in_bulk([pk for pk, _ in rows])
+        page = []
+        for pk, rank in rows:
+            # Индекс мог отстать от таблицы постов после загрузки
+            # в обход сигналов: такие записи пропускаются.
+            if pk in posts:
+                posts[pk].rank = rank
+                page.append(posts[pk])
+        return KeysetPage(
+            page,
+            cursor,
+            self.encode_cursor(page[-1], 'next')
+            if page and has_next else None,
+            self.encode_cursor(page[0], 'prev')
+            if page and has_previous else None,
+        )
+
+
+def get_page(query, cursor, per_page):
+    """Страница результатов поиска query по курсору."""
+    if is_supported():
+        return SearchPaginator(query, per_page).get_page(cursor)
+    if not WORD.search(query):
+        return KeysetPage([], '', None, None)
+    posts = Post.objects.for_feed()
+    for word in WORD.findall(query):
+        posts = posts.filter(text__icontains=word)
+    return KeysetPaginator(posts, per_page).get_page(cursor)
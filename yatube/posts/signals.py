@@ -0,0 +1,163 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+
+from . import cards, counters, etags, feeds, images, search
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+CARD_AUTHOR_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+# Счётчики подключены раньше раскладки ленты: она сверяется
+# с уже обновлённым числом подписчиков автора.
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created and instance.user_id and instance.author_id:
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    if instance.user_id and instance.author_id:
+        counters.change_user(instance.author_id, 'followers_count', -1)
+        counters.change_user(instance.user_id, 'following_count', -1)
+
+
+@receiver(pre_delete, sender=User)
+def count_deleted_user_follows(sender, instance, **kwargs):
+    # Меняются счётчики на страницах других пользователей, а удаление
+    # пользователя редко: проще сменить версию всех страниц.
+    counters.forget_user(instance.pk)
+    etags.bump_feeds('all')
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        feeds.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_follow_feed(sender, instance, created, **kwargs):
+    if created and instance.user_id and instance.author_id:
+        feeds.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def purge_follow_feed(sender, instance, **kwargs):
+    if instance.user_id and instance.author_id:
+        feeds.purge(instance.user_id, instance.author_id)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def bump_post_card_version(sender, instance, **kwargs):
+    cards.bump_version('post', instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, update_fields, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_post_text(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Group)
+def bump_group_card_version(sender, instance, **kwargs):
+    cards.bump_version('group', instance.pk)
+    etags.bump_feeds('all')
+
+
+@receiver(post_save, sender=User)
+def bump_author_card_version(sender, instance, update_fields, **kwargs):
+    if update_fields is None or CARD_AUTHOR_FIELDS & set(update_fields):
+        cards.bump_version('author', instance.pk)
+        etags.bump_feeds('all')
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_post(sender, instance, raw, **kwargs):
+    # При переносе поста в другую группу меняется и лента прежней,
+    # при замене картинки — счётчик ссылок на прежний файл.
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    if instance.pk and not raw:
+        previous = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image'
+        ).first()
+        if previous is not None:
+            instance._previous_group_id, instance._previous_image = previous
+
+
+@receiver([post_save, post_delete], sender=Post)
+def bump_post_feed_versions(sender, instance, **kwargs):
+    etags.bump_post_feeds(
+        instance.author_id,
+        instance.group_id,
+        getattr(instance, '_previous_group_id', None),
+    )
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def bump_comments_version(sender, instance, **kwargs):
+    cards.bump_version('comments', instance.post_id)
+
+
+@receiver([post_save, post_delete], sender=Follow)
+def bump_follow_feed_versions(sender, instance, **kwargs):
+    if instance.user_id and instance.author_id:
+        etags.bump_feeds(
+            f'author:{instance.author_id}',
+            f'author:{instance.user_id}',
+            f'follows:{instance.user_id}',
+        )
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, raw, **kwargs):
+    previous = getattr(instance, '_previous_image', '')
+    if raw or instance.image.name == previous:
+        return
+    if instance.image:
+        images.retain(instance.image.name)
+    if previous:
+        images.release(previous)
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    if instance.image:
+        images.release(instance.image.name)
@@ -0,0 +1,42 @@
+"""Хранилище картинок постов с дедупликацией по содержимому.
+
+Одинаковые файлы (перезалитые мемы) хранятся один раз: при сохранении
+считается SHA-256 содержимого, и если такая картинка уже есть,
+возвращается имя существующего файла, а новый не пишется. Имя остаётся
+тем, под которым картинку загрузили первой, поэтому и миниатюры sorl,
+привязанные к имени, у всех копий общие. Сколько постов ссылается
+на файл, считает StoredImage.refcount (см. images.retain и release).
+"""
+import hashlib
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def file_digest(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+@deconstructible
+class DedupImageStorage(FileSystemStorage):
+    def _save(self, name, content):
+        # Модель берётся из реестра: models импортирует это хранилище.
+        StoredImage = apps.get_model('posts', 'StoredImage')
+        digest = file_digest(content)
+        stored = StoredImage.objects.filter(digest=digest).first()
+        if stored is not None:
+            if self.exists(stored.name):
+                return stored.name
+            stored.delete()
+        name = super()._save(name, content)
+        stored, created = StoredImage.objects.get_or_create(
+            digest=digest, defaults={'name': name}
+        )
+        if not created:
+            # Такую же картинку только что сохранил другой запрос.
+            self.delete(name)
+        return stored.name
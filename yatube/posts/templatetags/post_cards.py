@@ -0,0 +1,42 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import format_html
+
+from ..cards import render_cards
+
+
+register = template.Library()
+
+FOLLOW_BUTTON = (
+    '<a class="btn btn-sm {}" href="{}" role="button">{}</a>'
+)
+
+
+@register.simple_tag
+def post_cards(posts):
+    return render_cards(posts)
+
+
+@register.simple_tag(takes_context=True)
+def follow_button(context, author):
+    """Кнопка «Подписаться»/«Отписаться» у поста ленты.
+
+    Рисуется без include: в ленте кнопка стоит у каждой карточки,
+    а подписки зрителя уже собраны в followed_ids одним запросом.
+    """
+    user = context.get('user')
+    if user is None or not user.is_authenticated or user.pk == author.pk:
+        return ''
+    if author.pk in context.get('followed_ids', ()):
+        return format_html(
+            FOLLOW_BUTTON,
+            'btn-light',
+            reverse('posts:profile_unfollow', args=[author.username]),
+            'Отписаться',
+        )
+    return format_html(
+        FOLLOW_BUTTON,
+        'btn-primary',
+        reverse('posts:profile_follow', args=[author.username]),
+        'Подписаться',
+    )
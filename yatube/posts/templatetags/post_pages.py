@@ -0,0 +1,8 @@
+from django import template
+
+from ..paginators import page_window
+
+
+register = template.Library()
+
+register.filter('page_window', page_window)
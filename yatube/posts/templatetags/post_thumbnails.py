@@ -0,0 +1,19 @@
+from django import template
+
+from .. import thumbnails
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(file_, geometry):
+    """Миниатюра, если она уже готова; иначе ставит её в очередь
+    и возвращает None, чтобы шаблон показал заглушку.
+    """
+    if not file_:
+        return None
+    thumbnail = thumbnails.ready_thumbnail(file_, geometry)
+    if thumbnail is None:
+        thumbnails.schedule(file_.name)
+    return thumbnail
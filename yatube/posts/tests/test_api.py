@@ -0,0 +1,145 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.api import DEFAULT_POST_FIELDS
+from posts.models import Comment, Follow, Group, Post
+from posts.views import POSTS_PER_PAGE
+
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='test_author', first_name='Автор'
+        )
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание'
+        )
+        Post.objects.bulk_create([
+            Post(author=cls.author, group=cls.group, text=f'Пост {i}')
+            for i in range(POSTS_PER_PAGE + 5)
+        ])
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Последний пост'
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds_return_default_fields(self):
+        """Ленты API отдают посты с полями по умолчанию."""
+        urls = (
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:api_profile', kwargs={'username': 'test_author'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                results = response.json()['results']
+                self.assertEqual(len(results), POSTS_PER_PAGE)
+                self.assertEqual(set(results[0]), set(DEFAULT_POST_FIELDS))
+                self.assertEqual(results[0]['id'], self.post.pk)
+                self.assertEqual(results[0]['author'], 'test_author')
+                self.assertEqual(results[0]['group'], 'test_slug')
+
+    def test_fields_selection(self):
+        """?fields= выбирает поля ответа, неизвестные поля — ошибка 400."""
+        response = self.guest_client.get(
+            reverse('posts:api_index'),
+            {'fields': 'id, author_name,group_title,image'},
+        )
+        self.assertEqual(response.json()['results'][0], {
+            'id': self.post.pk,
+            'author_name': 'Автор',
+            'group_title': 'Тестовая группа',
+            'image': None,
+        })
+        response = self.guest_client.get(
+            reverse('posts:api_index'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_cursor_walks_whole_feed(self):
+        """По next_cursor обходится вся лента без повторов."""
+        url = reverse('posts:api_index')
+        response = self.guest_client.get(url).json()
+        ids = [post['id'] for post in response['results']]
+        self.assertIsNone(response['previous_cursor'])
+        response = self.guest_client.get(
+            url, {'cursor': response['next_cursor']}
+        ).json()
+        ids += [post['id'] for post in response['results']]
+        self.assertIsNone(response['next_cursor'])
+        self.assertIsNotNone(response['previous_cursor'])
+        self.assertEqual(
+            ids,
+            list(Post.objects.order_by('-pub_date', '-id').values_list(
+                'id', flat=True
+            )),
+        )
+
+    def test_follow_feed(self):
+        """Лента подписок требует входа и показывает посты авторов."""
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(self.guest_client.get(url).status_code, 401)
+        self.assertEqual(self.reader_client.get(url).json()['results'], [])
+        Follow.objects.create(user=self.reader, author=self.author)
+        results = self.reader_client.get(url).json()['results']
+        self.assertEqual(results[0]['id'], self.post.pk)
+
+    def test_post_detail(self):
+        """Пост отдаётся с первой страницей комментариев."""
+        response = self.guest_client.get(
+            reverse('posts:api_post_detail', kwargs={'post_id': self.post.pk}),
+            {'fields': 'id,text,comments_count'},
+        )
+        data = response.json()
+        self.assertEqual(data['text'], 'Последний пост')
+        self.assertEqual(data['comments_count'], 1)
+        self.assertEqual(
+            data['comments']['results'][0]['text'], 'Комментарий'
+        )
+        self.assertEqual(
+            data['comments']['results'][0]['author'], 'test_reader'
+        )
+        missing = self.guest_client.get(
+            reverse('posts:api_post_detail', kwargs={'post_id': 0})
+        )
+        self.assertEqual(missing.status_code, 404)
+
+    def test_feed_query_count(self):
+        """Страница ленты собирается одним запросом к постам."""
+        url = reverse('posts:api_group_list', kwargs={'slug': 'test_slug'})
+        self.guest_client.get(url)
+        cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            self.guest_client.get(url, {'fields': 'id,author,group_title'})
+        self.assertLessEqual(len(captured), 3)
+
+    @override_settings(CACHE_SHARED=True)
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304."""
+        url = reverse('posts:api_index')
+        response = self.guest_client.get(url)
+        response = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,184 @@
+import copy
+import json
+import os
+import tempfile
+import time
+import unittest
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import Paginator
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+
+from posts import search
+from posts.models import Comment, FeedItem, Follow, Group, Post, UserStats
+
+
+User = get_user_model()
+
+
+class SeedDataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_data', users=40, groups=3, posts=300, comments=400,
+            follows=5, random_seed=1, stdout=StringIO(),
+        )
+
+    def test_seed_data_is_consistent(self):
+        """Загрузка в обход сигналов пересобирает счётчики,
+        ленты и поисковый индекс.
+        """
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 400)
+        self.assertEqual(UserStats.objects.count(), 40)
+        for stats in UserStats.objects.all():
+            self.assertEqual(
+                stats.followers_count,
+                Follow.objects.filter(author=stats.user_id).count(),
+            )
+        self.assertEqual(
+            FeedItem.objects.count(),
+            sum(
+                Post.objects.filter(author=follow.author_id).count()
+                for follow in Follow.objects.all()
+            ),
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {search.TABLE}')
+            self.assertEqual(cursor.fetchone()[0], 300)
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1
+        )
+
+    def test_followers_are_skewed(self):
+        """Подписчики распределены неравномерно: у самого популярного
+        автора их в разы больше среднего.
+        """
+        counts = list(
+            UserStats.objects.values_list('followers_count', flat=True)
+        )
+        self.assertGreater(max(counts), 3 * sum(counts) / len(counts))
+
+    def test_benchmark_writes_comparable_json(self):
+        """Бенчмарк сохраняет p50/p99 и число запросов по представлениям
+        и сравнивает прогон с сохранённым.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command(
+                'benchmark_views', requests=2, output=path,
+                stdout=StringIO(),
+            )
+            with open(path, encoding='utf-8') as file:
+                report = json.load(file)
+            out = StringIO()
+            call_command(
+                'benchmark_views', requests=2, compare=path, stdout=out,
+            )
+        self.assertEqual(set(report['views']), {
+            'posts:index', 'posts:group_list', 'posts:profile',
+            'posts:post_detail', 'posts:follow_index',
+        })
+        for name, result in report['views'].items():
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+            # Главная с прогретым кешем обходится без запросов к базе.
+            if name != 'posts:index':
+                self.assertGreater(result['queries'], 0)
+        self.assertIn('posts:profile: p50', out.getvalue())
+
+
+def templates_with_loaders(loaders):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['OPTIONS']['loaders'] = loaders
+    return templates
+
+
+PLAIN_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+CACHED_LOADERS = [('django.template.loaders.cached.Loader', PLAIN_LOADERS)]
+
+
+class TemplateRenderBenchmarkTests(TestCase):
+    """Микробенчмарк отрисовки главной с 10, 50 и 100 постами:
+    загрузчик без кеша и карточки по одной против кеширующего
+    загрузчика и скомпилированных карточек.
+    """
+
+    SIZES = (10, 50, 100)
+    ROUNDS = 3
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='test_auth', first_name='Иван', last_name='Петров',
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug',
+        )
+        Post.objects.bulk_create([
+            Post(
+                author=cls.user,
+                group=cls.group if i % 2 else None,
+                text=f'Пост {i}\nвторая строка <b>{i}</b>',
+            )
+            for i in range(max(cls.SIZES))
+        ])
+
+    def render_index(self, size):
+        """Время (лучшее из ROUNDS) и HTML главной с size постами."""
+        page_obj = Paginator(Post.objects.for_feed(), size).page(1)
+        context = {'page_obj': page_obj, 'title': 'Главная', 'index': True}
+        timings = []
+        for _ in range(self.ROUNDS):
+            # Карточки и фрагмент ленты не должны браться из кеша.
+            cache.clear()
+            started = time.perf_counter()
+            html = render_to_string('posts/index.html', context)
+            timings.append(time.perf_counter() - started)
+        return min(timings), html
+
+    def measure(self, loaders, compiled):
+        with override_settings(
+            TEMPLATES=templates_with_loaders(loaders),
+            POST_CARDS_COMPILED=compiled,
+        ):
+            return {size: self.render_index(size) for size in self.SIZES}
+
+    def test_cached_loader_and_compiled_cards_render_same_html(self):
+        """Кеширующий загрузчик и скомпилированные карточки дают тот же
+        HTML."""
+        slow = self.measure(PLAIN_LOADERS, compiled=False)
+        fast = self.measure(CACHED_LOADERS, compiled=True)
+        for size in self.SIZES:
+            with self.subTest(size=size):
+                self.assertEqual(fast[size][1], slow[size][1])
+                self.assertEqual(
+                    fast[size][1].count('<article>'), size
+                )
+
+    @unittest.skipUnless(
+        os.getenv('YATUBE_BENCHMARK'),
+        'замер времени включается переменной YATUBE_BENCHMARK=1',
+    )
+    def test_cached_loader_and_compiled_cards_render_faster(self):
+        """Главная со 100 постами рисуется быстрее. Время зависит
+        от машины, поэтому тест запускается только по запросу."""
+        slow = self.measure(PLAIN_LOADERS, compiled=False)
+        fast = self.measure(CACHED_LOADERS, compiled=True)
+        timings = ', '.join(
+            f'{size} постов: {slow[size][0] * 1000:.2f} мс -> '
+            f'{fast[size][0] * 1000:.2f} мс'
+            for size in self.SIZES
+        )
+        self.assertLess(fast[100][0], slow[100][0], timings)
@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import cards
+from posts.cards import CARD_TEMPLATE
+from posts.models import Group, Post
+
+
+User = get_user_model()
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='test_auth',
+            first_name='Иван',
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='Test_slug',
+            description='Тестовое описание группы',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+        cls.url = reverse('posts:group_list', kwargs={'slug': cls.group.slug})
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_cached_card_is_not_rendered_again(self):
+        """Повторный показ ленты берёт карточку из кеша."""
+        response = self.guest_client.get(PostCardCacheTests.url)
+        self.assertTemplateUsed(response, CARD_TEMPLATE)
+        response = self.guest_client.get(PostCardCacheTests.url)
+        self.assertTemplateNotUsed(response, CARD_TEMPLATE)
+        self.assertContains(response, 'Тестовый пост')
+
+    def test_card_is_invalidated_on_changes(self):
+        """Карточка перерисовывается после изменения поста и автора."""
+        self.guest_client.get(PostCardCacheTests.url)
+        post = Post.objects.get(pk=PostCardCacheTests.post.pk)
+        post.text = 'Изменённый пост'
+        post.save()
+        self.assertContains(
+            self.guest_client.get(PostCardCacheTests.url),
+            'Изменённый пост',
+        )
+        author = User.objects.get(pk=PostCardCacheTests.user.pk)
+        author.first_name = 'Пётр'
+        author.save()
+        response = self.guest_client.get(PostCardCacheTests.url)
+        self.assertContains(response, 'Пётр')
+        self.assertNotContains(response, 'Иван')
+
+    def test_card_key_does_not_depend_on_cache_versions(self):
+        """Ключ карточки берётся из строки поста: правку видит и процесс,
+        до которого не дошла новая версия в кеше."""
+        self.guest_client.get(PostCardCacheTests.url)
+        with mock.patch.object(cards, 'bump_version'):
+            post = Post.objects.get(pk=PostCardCacheTests.post.pk)
+            post.text = 'Правка в другом воркере'
+            post.save()
+            author = User.objects.get(pk=PostCardCacheTests.user.pk)
+            author.last_name = 'Сидоров'
+            author.save()
+        response = self.guest_client.get(PostCardCacheTests.url)
+        self.assertContains(response, 'Правка в другом воркере')
+        self.assertContains(response, 'Сидоров')
+
+    def test_card_with_placeholder_is_not_cached(self):
+        """Карточка с заглушкой вместо миниатюры не попадает в кеш."""
+        post = Post.objects.get(pk=PostCardCacheTests.post.pk)
+        post.image.name = 'posts/not_ready.png'
+        with mock.patch.object(
+            cards.thumbnails, 'ready_thumbnail', return_value=None
+        ), mock.patch.object(cards.thumbnails, 'schedule'):
+            html = cards.render_cards([post])[0][1]
+            self.assertIn('bg-light', html)
+            self.assertIsNone(cache.get(cards.card_key(post)))
+        cards.render_cards([PostCardCacheTests.post])
+        self.assertIsNotNone(
+            cache.get(cards.card_key(PostCardCacheTests.post))
+        )
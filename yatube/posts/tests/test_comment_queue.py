@@ -0,0 +1,221 @@
+import queue
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import routers
+from posts import cards, comment_queue
+from posts.comment_queue import CommentWriter
+from posts.models import Comment, Post
+
+
+User = get_user_model()
+
+
+class QueuedWriter(CommentWriter):
+    """Писатель без фонового потока: очередь пишет тест через flush."""
+
+    def flush(self):
+        """Записывает накопленное в очереди в текущем потоке."""
+        batch = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                batch.append(item)
+        for start in range(0, len(batch), self.batch_size):
+            self.write(batch[start:start + self.batch_size])
+
+
+class InlineWriter(QueuedWriter):
+    """Писатель без фонового потока: пишет сразу при постановке."""
+
+    def submit(self, comment):
+        future = super().submit(comment)
+        self.flush()
+        return future
+
+
+def resolve(batch):
+    """Подмена write: отмечает пачку записанной, не трогая базу."""
+    for _, future in batch:
+        future.set_result(True)
+
+
+class CommentWriterTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.other_post = Post.objects.create(author=cls.user, text='Другой')
+
+    def setUp(self):
+        cache.clear()
+        self.writer = QueuedWriter(interval=0.005, batch_size=500)
+
+    def test_batch_is_written_with_one_insert(self):
+        """Пачка комментариев сохраняется одним INSERT, счётчики
+        и версии комментариев постов обновляются."""
+        version = cards.get_versions(
+            [cards.version_key('comments', self.post.pk)]
+        )
+        futures = [
+            self.writer.submit(Comment(
+                post=post, author=self.user, text=f'Комментарий {i}'
+            ))
+            for i, post in enumerate([self.post] * 3 + [self.other_post])
+        ]
+        self.assertFalse(any(future.done() for future in futures))
+        with CaptureQueriesContext(connection) as queries:
+            self.writer.flush()
+        inserts = [
+            query for query in queries
+            if query['sql'].startswith('INSERT')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertTrue(all(future.result() for future in futures))
+        self.assertEqual(self.post.comments.count(), 3)
+        self.post.refresh_from_db()
+        self.other_post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+        self.assertEqual(self.other_post.comments_count, 1)
+        self.assertNotEqual(
+            cards.get_versions(
+                [cards.version_key('comments', self.post.pk)]
+            ),
+            version,
+        )
+
+    def test_failed_batch_is_written_one_by_one(self):
+        """Если пачка не записалась, комментарии сохраняются по одному,
+        а ошибка достаётся только своему запросу."""
+        good = self.writer.submit(
+            Comment(post=self.post, author=self.user, text='Хороший')
+        )
+        bad = self.writer.submit(Comment(post=self.post, text='Без автора'))
+        with self.assertLogs('posts.comment_queue', 'ERROR'):
+            self.writer.flush()
+        self.assertTrue(good.result())
+        self.assertIsNotNone(bad.exception())
+        self.assertEqual(
+            list(self.post.comments.values_list('text', flat=True)),
+            ['Хороший'],
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_cache_error_does_not_fail_written_batch(self):
+        """Ошибка кеша после записи пачки не делает запросы
+        неудачными."""
+        future = self.writer.submit(
+            Comment(post=self.post, author=self.user, text='Записан')
+        )
+        with mock.patch.object(
+            cards, 'bump_version', side_effect=OSError
+        ), self.assertLogs('posts.comment_queue', 'ERROR'):
+            self.writer.flush()
+        self.assertTrue(future.result())
+        self.assertEqual(self.post.comments.count(), 1)
+
+
+class CommentWriterThreadTests(SimpleTestCase):
+    def test_thread_groups_queued_comments(self):
+        """Поток собирает очередь в пачки не больше batch_size
+        и перед остановкой дописывает всё, что осталось."""
+        writer = CommentWriter(interval=0.05, batch_size=3)
+        batches = []
+        with mock.patch.object(
+            writer, 'write', lambda batch: batches.append(len(batch))
+        ):
+            for i in range(5):
+                writer.submit(Comment(text=f'Комментарий {i}'))
+            writer.start()
+            writer.stop()
+        self.assertEqual(batches, [3, 2])
+
+    def test_thread_survives_failed_batch(self):
+        """Исключение пачки достаётся её запросам, а поток пишет
+        следующие пачки."""
+        writer = CommentWriter(interval=0.005, batch_size=500)
+        failures = [RuntimeError('сбой')]
+
+        def write(batch):
+            if failures:
+                raise failures.pop()
+            resolve(batch)
+
+        with mock.patch.object(writer, 'write', write), \
+                self.assertLogs('posts.comment_queue', 'ERROR'):
+            writer.start()
+            self.addCleanup(writer.stop)
+            failed = writer.submit(Comment(text='Первый'))
+            self.assertIsInstance(failed.exception(timeout=5), RuntimeError)
+            written = writer.submit(Comment(text='Второй'))
+            self.assertTrue(written.result(timeout=5))
+            self.assertTrue(writer.is_alive())
+
+    def test_get_writer_restarts_dead_thread(self):
+        """Остановившийся поток перезапускается на той же очереди."""
+        writer = CommentWriter(interval=0.005, batch_size=500)
+        writer.thread = threading.Thread(target=lambda: None)
+        writer.thread.start()
+        writer.thread.join()
+        queued = writer.submit(Comment(text='Ждёт в очереди'))
+        with mock.patch.object(comment_queue, '_writer', writer), \
+                mock.patch.object(writer, 'write', resolve), \
+                self.assertLogs('posts.comment_queue', 'ERROR'):
+            self.assertIs(comment_queue.get_writer(), writer)
+            self.assertTrue(writer.is_alive())
+            self.assertTrue(queued.result(timeout=5))
+            writer.stop()
+
+
+@override_settings(COMMENTS_WRITE_MODE='batch')
+class BatchModeViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(BatchModeViewTests.user)
+        patcher = mock.patch.object(
+            comment_queue, 'get_writer',
+            return_value=InlineWriter(interval=0.005, batch_size=500),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_redirect_shows_own_comment(self):
+        """В режиме batch после редиректа автор видит свой комментарий,
+        а сеанс закреплён за основной базой."""
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Из очереди'},
+            follow=True,
+        )
+        self.assertContains(response, 'Из очереди')
+        self.assertEqual(response.context['post'].comments_count, 1)
+        self.assertIn('pin_primary', self.client.cookies)
+
+    def test_note_write_pins_primary(self):
+        """Запись через очередь закрепляет чтение за основной базой."""
+        routers.reset(pinned=False)
+        self.addCleanup(routers.reset)
+        comment_queue.save(
+            Comment(post=self.post, author=self.user, text='Пишу')
+        )
+        self.assertTrue(routers.wrote())
+        self.assertTrue(routers.is_pinned())
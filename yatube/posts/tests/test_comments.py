@@ -0,0 +1,110 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Post
+from posts.views import COMMENTS_PER_PAGE
+
+
+User = get_user_model()
+
+
+class CommentsPageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.quiet_post = Post.objects.create(author=cls.author, text='Тихо')
+        readers = [
+            User.objects.create_user(username=f'reader_{i}')
+            for i in range(5)
+        ]
+        Comment.objects.bulk_create([
+            Comment(
+                post=cls.post,
+                author=readers[i % 5],
+                text=f'Комментарий {i}',
+            )
+            for i in range(45)
+        ])
+        Comment.objects.create(
+            post=cls.quiet_post, author=cls.author, text='Единственный'
+        )
+        # У половины комментариев одинаковое время: порядок решает id.
+        now = timezone.now()
+        for i, comment in enumerate(Comment.objects.filter(
+                post=cls.post).order_by('id')[:20]):
+            Comment.objects.filter(pk=comment.pk).update(
+                created=now - datetime.timedelta(minutes=i // 2)
+            )
+        cls.expected = list(
+            Comment.objects.filter(post=cls.post).order_by('-created', '-id')
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def detail(self, post, **params):
+        return self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            params,
+        )
+
+    def test_post_detail_shows_first_comments_page(self):
+        """На странице поста только первая порция комментариев,
+        от новых к старым, со ссылкой на следующую.
+        """
+        response = self.detail(CommentsPageTests.post)
+        page = response.context['comments_page']
+        self.assertEqual(
+            list(page), CommentsPageTests.expected[:COMMENTS_PER_PAGE]
+        )
+        self.assertContains(response, f'?comments={page.next_cursor}')
+        response = self.detail(
+            CommentsPageTests.post, comments=page.next_cursor
+        )
+        self.assertEqual(
+            list(response.context['comments_page']),
+            CommentsPageTests.expected[
+                COMMENTS_PER_PAGE:2 * COMMENTS_PER_PAGE],
+        )
+
+    def test_post_detail_queries_do_not_grow_with_comments(self):
+        """Число запросов не зависит от числа комментариев."""
+        counts = []
+        for post in (CommentsPageTests.quiet_post, CommentsPageTests.post):
+            with CaptureQueriesContext(connection) as queries:
+                self.detail(post)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_load_more_json_walks_all_comments(self):
+        """JSON-эндпоинт по курсорам отдаёт все комментарии по порядку."""
+        url = reverse(
+            'posts:post_comments',
+            kwargs={'post_id': CommentsPageTests.post.pk},
+        )
+        ids = []
+        cursor = ''
+        while cursor is not None:
+            data = self.guest_client.get(url, {'cursor': cursor}).json()
+            ids.extend(comment['id'] for comment in data['comments'])
+            cursor = data['next_cursor']
+        self.assertEqual(
+            ids, [comment.pk for comment in CommentsPageTests.expected]
+        )
+        first = self.guest_client.get(url).json()['comments'][0]
+        self.assertEqual(
+            first['author_url'],
+            reverse('posts:profile', args=[first['author']]),
+        )
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
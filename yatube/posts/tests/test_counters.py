@@ -0,0 +1,97 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, UserStats
+
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.reader = User.objects.create_user(username='test_reader')
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(CountersTests.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(CountersTests.reader)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_views(self):
+        """Счётчики меняются при создании поста, комментария,
+        подписке, отписке и удалении.
+        """
+        author = CountersTests.author
+        reader = CountersTests.reader
+        self.author_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Новый пост'},
+        )
+        post = Post.objects.get(text='Новый пост')
+        self.assertEqual(self.stats(author).posts_count, 1)
+        self.reader_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.id}),
+            data={'text': 'Комментарий'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': author.username}))
+        self.assertEqual(self.stats(author).followers_count, 1)
+        self.assertEqual(self.stats(reader).following_count, 1)
+        response = self.reader_client.get(reverse(
+            'posts:profile', kwargs={'username': author.username}))
+        self.assertContains(response, 'Всего постов: 1')
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': author.username}))
+        self.assertEqual(self.stats(author).followers_count, 0)
+        self.assertEqual(self.stats(reader).following_count, 0)
+        Comment.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(author).posts_count, 0)
+
+    def test_deleted_user_leaves_follow_counters(self):
+        """Удаление подписчика или автора уменьшает счётчики подписок
+        другой стороны, хотя подписки только обнуляются."""
+        follower = User.objects.create_user(username='test_follower')
+        author = User.objects.create_user(username='test_popular')
+        Follow.objects.create(user=follower, author=CountersTests.author)
+        Follow.objects.create(user=CountersTests.reader, author=author)
+        follower.delete()
+        author.delete()
+        self.assertEqual(self.stats(CountersTests.author).followers_count, 0)
+        self.assertEqual(self.stats(CountersTests.reader).following_count, 0)
+        self.assertFalse(Follow.objects.filter(
+            user__isnull=False, author__isnull=False
+        ).exists())
+
+    def test_recount_repairs_drift(self):
+        """Команда recount_counters исправляет расхождения счётчиков."""
+        author = CountersTests.author
+        reader = CountersTests.reader
+        Post.objects.bulk_create(
+            [Post(author=author, text=f'Пост {i}') for i in range(3)]
+        )
+        post = Post.objects.filter(author=author).first()
+        Comment.objects.bulk_create(
+            [Comment(author=reader, post=post, text='Комментарий')]
+        )
+        Follow.objects.bulk_create([Follow(user=reader, author=author)])
+        UserStats.objects.filter(user=reader).delete()
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(self.stats(author).posts_count, 3)
+        self.assertEqual(self.stats(author).followers_count, 1)
+        self.assertEqual(self.stats(reader).following_count, 1)
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
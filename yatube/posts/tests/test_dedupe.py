@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, StoredImage
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+OTHER_GIF = SMALL_GIF.replace(b'\xFF\xFF\xFF', b'\x00\xFF\x00')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAILS_MODE='sync')
+class DedupImageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'posts'), True)
+        self.author_client = Client()
+        self.author_client.force_login(DedupImageTests.user)
+        # TestCase не фиксирует транзакцию: on_commit выполняется сразу.
+        patcher = mock.patch(
+            'django.db.transaction.on_commit', lambda func: func()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create(self, text, name, content=SMALL_GIF):
+        self.author_client.post(
+            reverse('posts:post_create'),
+            data={'text': text, 'image': SimpleUploadedFile(name, content)},
+        )
+        return Post.objects.get(text=text)
+
+    def test_same_image_is_stored_once(self):
+        """Повторная загрузка той же картинки ссылается на первый файл."""
+        first = self.create('Первый', 'meme.gif')
+        second = self.create('Второй', 'repost.gif')
+        other = self.create('Третий', 'other.gif', OTHER_GIF)
+        self.assertEqual(first.image.name, 'posts/meme.gif')
+        self.assertEqual(second.image.name, 'posts/meme.gif')
+        self.assertEqual(other.image.name, 'posts/other.gif')
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'posts'))),
+            ['meme.gif', 'other.gif'],
+        )
+        stored = StoredImage.objects.get(name='posts/meme.gif')
+        self.assertEqual(stored.refcount, 2)
+
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл удаляется, когда на него не ссылается ни один пост."""
+        first = self.create('Первый', 'meme.gif')
+        second = self.create('Второй', 'repost.gif')
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(
+            StoredImage.objects.get(name='posts/meme.gif').refcount, 1
+        )
+        second.image = ContentFile(OTHER_GIF, name='other.gif')
+        second.save()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(
+            StoredImage.objects.filter(name='posts/meme.gif').exists()
+        )
+        self.assertEqual(
+            StoredImage.objects.get(name='posts/other.gif').refcount, 1
+        )
+
+    def test_dedupe_command(self):
+        """Команда переводит посты на одну копию и удаляет остальные."""
+        directory = os.path.join(TEMP_MEDIA_ROOT, 'posts')
+        os.makedirs(os.path.join(directory, 'old'))
+        for name, content in (
+            ('a.gif', SMALL_GIF),
+            ('old/b.gif', SMALL_GIF),
+            ('c.gif', OTHER_GIF),
+            ('d.gif', SMALL_GIF),
+        ):
+            with open(os.path.join(directory, name), 'wb') as file:
+                file.write(content)
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Ранний', image='posts/old/b.gif'),
+            Post(author=self.user, text='Поздний', image='posts/a.gif'),
+            Post(author=self.user, text='Другой', image='posts/c.gif'),
+        ])
+        call_command('dedupe_images', '--dry-run', stdout=StringIO())
+        self.assertEqual(len(os.listdir(directory)), 4)
+        output = StringIO()
+        call_command('dedupe_images', stdout=output)
+        self.assertIn('Удалено копий: 2', output.getvalue())
+        self.assertEqual(
+            set(Post.objects.values_list('image', flat=True)),
+            {'posts/old/b.gif', 'posts/c.gif'},
+        )
+        self.assertEqual(sorted(os.listdir(directory)), ['c.gif', 'old'])
+        self.assertEqual(
+            dict(StoredImage.objects.values_list('name', 'refcount')),
+            {'posts/old/b.gif': 2, 'posts/c.gif': 1},
+        )
+        post = self.create('Новый', 'again.gif')
+        self.assertEqual(post.image.name, 'posts/old/b.gif')
@@ -0,0 +1,154 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+@override_settings(CACHE_SHARED=True)
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other_slug',
+            description='Тестовое описание группы',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Тестовый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+
+    def revalidate(self, client, url):
+        """Запрашивает url и повторяет запрос с полученными валидаторами."""
+        response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        headers = {'HTTP_IF_NONE_MATCH': response['ETag']}
+        if response.has_header('Last-Modified'):
+            headers['HTTP_IF_MODIFIED_SINCE'] = response['Last-Modified']
+        return lambda: client.get(url, **headers)
+
+    def test_unchanged_pages_answer_304_without_rendering(self):
+        """Неизменившаяся страница отдаёт 304 без рендеринга шаблонов."""
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': 'test_slug'}),
+            reverse('posts:profile', kwargs={'username': 'test_author'}),
+            reverse('posts:post_detail', kwargs={
+                'post_id': ConditionalGetTests.post.pk}),
+        )
+        for client in (self.guest_client, self.reader_client):
+            for url in urls:
+                with self.subTest(url=url):
+                    response = self.revalidate(client, url)()
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.templates, [])
+
+    def test_last_modified_only_for_guests(self):
+        """Last-Modified получают только анонимы."""
+        url = reverse('posts:profile', kwargs={'username': 'test_author'})
+        self.assertTrue(self.guest_client.get(url).has_header(
+            'Last-Modified'))
+        self.assertFalse(self.reader_client.get(url).has_header(
+            'Last-Modified'))
+        response = self.guest_client.get(url)
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate_validators(self):
+        """Новый пост, комментарий, подписка и перенос поста в другую
+        группу меняют валидаторы затронутых страниц.
+        """
+        post = ConditionalGetTests.post
+        profile = reverse('posts:profile', kwargs={
+            'username': 'test_author'})
+        detail = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        group = reverse('posts:group_list', kwargs={'slug': 'test_slug'})
+        cases = (
+            (profile, lambda: Post.objects.create(
+                author=ConditionalGetTests.author, text='Новый пост')),
+            (detail, lambda: Comment.objects.create(
+                post=post, author=ConditionalGetTests.reader,
+                text='Комментарий')),
+            (profile, lambda: Follow.objects.create(
+                user=ConditionalGetTests.reader,
+                author=ConditionalGetTests.author)),
+            (group, lambda: Post.objects.filter(pk=post.pk).first().save()),
+        )
+        for url, change in cases:
+            with self.subTest(url=url):
+                repeat = self.revalidate(self.reader_client, url)
+                change()
+                self.assertEqual(repeat().status_code, 200)
+        repeat = self.revalidate(self.reader_client, group)
+        moved = Post.objects.get(pk=post.pk)
+        moved.group = ConditionalGetTests.other_group
+        moved.save()
+        self.assertEqual(repeat().status_code, 200)
+
+    def test_viewer_is_part_of_etag(self):
+        """Чужой ETag не подходит другому зрителю."""
+        url = reverse('posts:profile', kwargs={'username': 'test_author'})
+        etag = self.guest_client.get(url)['ETag']
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_new_login_changes_etag(self):
+        """После повторного входа (новые сессия и CSRF-токен) страница
+        с формой комментария отдаётся заново, а не 304 со старым
+        токеном."""
+        url = reverse('posts:post_detail', kwargs={
+            'post_id': ConditionalGetTests.post.pk})
+        request_again = self.revalidate(self.reader_client, url)
+        self.assertEqual(request_again().status_code, 304)
+        self.reader_client.logout()
+        self.reader_client.force_login(ConditionalGetTests.reader)
+        self.assertEqual(request_again().status_code, 200)
+
+    def test_index_waits_for_cached_fragment(self):
+        """Главная выдаёт валидаторы, только когда закешированный
+        фрагмент заведомо новее последнего изменения.
+        """
+        url = reverse('posts:index')
+        self.assertFalse(self.guest_client.get(url).has_header('ETag'))
+        later = time.time() + 60
+        with mock.patch('posts.etags.time.time', return_value=later):
+            response = self.revalidate(self.guest_client, url)()
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(CACHE_SHARED=False)
+    def test_no_validators_without_shared_cache(self):
+        """С кешем в процессе (locmem) валидаторы не выдаются
+        и страница всегда отдаётся целиком."""
+        url = reverse('posts:profile', kwargs={'username': 'test_author'})
+        response = self.guest_client.get(url)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.guest_client.get(
+            url, HTTP_IF_NONE_MATCH='*',
+            HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 2099 00:00:00 GMT',
+        )
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import exports
+from posts.models import Comment, Group, Post
+
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user,
+                group=cls.group if i % 3 else None,
+                text=f'Тестовый пост № {i}',
+                image='posts/small.gif' if i == 1 else '',
+            )
+            for i in range(7)
+        ]
+        Comment.objects.create(
+            post=cls.posts[1], author=cls.user, text='Первый'
+        )
+        Comment.objects.create(
+            post=cls.posts[1], author=cls.user, text='Второй'
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ExportTests.user)
+
+    def stream(self, url, **params):
+        response = self.authorized_client.get(url, params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_chunks_cover_all_posts_once(self):
+        """Порции по id обходят все посты без пропусков и повторов."""
+        chunks = list(exports.iter_chunks(Post.objects.all(), chunk_size=3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual(
+            [post for chunk in chunks for post in chunk],
+            sorted(ExportTests.posts, key=lambda post: post.pk),
+        )
+
+    def test_group_export_ndjson(self):
+        """Группа выгружается в NDJSON с комментариями и картинками."""
+        content = self.stream(reverse(
+            'posts:group_export', kwargs={'slug': ExportTests.group.slug}
+        ))
+        records = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [record['id'] for record in records],
+            [post.pk for post in ExportTests.posts[1:] if post.group],
+        )
+        first = records[0]
+        self.assertEqual(first['group'], ExportTests.group.slug)
+        self.assertEqual(
+            first['image'], 'http://testserver/media/posts/small.gif'
+        )
+        self.assertEqual(
+            [comment['text'] for comment in first['comments']],
+            ['Первый', 'Второй'],
+        )
+
+    def test_profile_export_csv(self):
+        """Посты автора выгружаются в CSV с заголовком."""
+        content = self.stream(
+            reverse(
+                'posts:profile_export',
+                kwargs={'username': ExportTests.user.username},
+            ),
+            format='csv',
+        )
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), len(ExportTests.posts))
+        self.assertEqual(rows[0]['text'], 'Тестовый пост № 0')
+        self.assertEqual(len(json.loads(rows[1]['comments'])), 2)
+
+    def test_export_command(self):
+        """Команда export_posts выгружает посты автора."""
+        out = StringIO()
+        call_command(
+            'export_posts', '--author', ExportTests.user.username,
+            '--chunk-size', '2', stdout=out,
+        )
+        self.assertEqual(
+            len(out.getvalue().splitlines()), len(ExportTests.posts)
+        )
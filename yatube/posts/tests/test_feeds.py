@@ -0,0 +1,212 @@
+from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.feeds import FollowFeed, FollowFeedPaginator
+from posts.models import FeedItem, Follow, Post
+
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.follower = User.objects.create_user(username='test_follower')
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(FollowFeedTests.follower)
+
+    def feed_posts(self):
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_purges_feed(self):
+        """Подписка добавляет в ленту старые посты автора,
+        отписка убирает их.
+        """
+        self.follower_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': FollowFeedTests.author.username}
+        ))
+        self.assertTrue(FeedItem.objects.filter(
+            user=FollowFeedTests.follower,
+            post=FollowFeedTests.old_post,
+        ).exists())
+        self.assertEqual(self.feed_posts(), [FollowFeedTests.old_post])
+        self.follower_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': FollowFeedTests.author.username}
+        ))
+        self.assertFalse(FeedItem.objects.filter(
+            user=FollowFeedTests.follower).exists())
+        self.assertEqual(self.feed_posts(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост раскладывается в ленты подписчиков."""
+        Follow.objects.create(
+            user=FollowFeedTests.follower,
+            author=FollowFeedTests.author,
+        )
+        self.follower_client.force_login(FollowFeedTests.author)
+        self.follower_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост после подписки'},
+        )
+        new_post = Post.objects.get(text='Пост после подписки')
+        self.assertTrue(FeedItem.objects.filter(
+            user=FollowFeedTests.follower,
+            post=new_post,
+        ).exists())
+        self.follower_client.force_login(FollowFeedTests.follower)
+        self.assertEqual(
+            self.feed_posts(),
+            [new_post, FollowFeedTests.old_post],
+        )
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=0)
+    def test_popular_author_is_read_without_fan_out(self):
+        """Посты популярного автора не раскладываются по лентам,
+        а подмешиваются при чтении.
+        """
+        Follow.objects.create(
+            user=FollowFeedTests.follower,
+            author=FollowFeedTests.author,
+        )
+        new_post = Post.objects.create(
+            author=FollowFeedTests.author,
+            text='Пост популярного автора',
+        )
+        self.assertFalse(FeedItem.objects.exists())
+        self.assertEqual(
+            self.feed_posts(),
+            [new_post, FollowFeedTests.old_post],
+        )
+
+    def test_feed_page_is_an_index_range_read(self):
+        """Страница подписок читается диапазоном индекса FeedItem
+        без сортировки всей ленты."""
+        Follow.objects.create(
+            user=FollowFeedTests.follower,
+            author=FollowFeedTests.author,
+        )
+        with CaptureQueriesContext(connection) as queries:
+            self.feed_posts()
+        feed_queries = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "posts_feeditem"' in query['sql']
+            and 'COUNT(' not in query['sql']
+        ]
+        self.assertEqual(len(feed_queries), 1)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + feed_queries[0])
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('posts_feed_user_pub_post_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_fanned_out_and_read_authors_are_merged(self):
+        """Посты из FeedItem и посты авторов без раскладки сливаются
+        по дате и в нумерованных страницах, и по курсорам."""
+        popular = User.objects.create_user(username='test_popular')
+        fan = User.objects.create_user(username='test_fan')
+        Follow.objects.create(user=fan, author=popular)
+        for author in (FollowFeedTests.author, popular):
+            Follow.objects.create(
+                user=FollowFeedTests.follower, author=author
+            )
+        for i in range(6):
+            Post.objects.create(
+                author=popular if i % 2 else FollowFeedTests.author,
+                text=f'Пост {i}',
+            )
+        expected = list(Post.objects.filter(
+            author__in=[FollowFeedTests.author, popular]
+        ).order_by('-pub_date', '-id'))
+        self.assertEqual(
+            FeedItem.objects.filter(user=FollowFeedTests.follower).count(),
+            4,
+        )
+        feed = FollowFeed(FollowFeedTests.follower)
+        self.assertEqual(feed.count(), len(expected))
+        paginator = Paginator(feed, 3)
+        self.assertEqual(
+            [post for number in paginator.page_range
+             for post in paginator.page(number)],
+            expected,
+        )
+        paginator = FollowFeedPaginator(feed, 3)
+        pages = [paginator.get_page('')]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([post for page in pages for post in page], expected)
+        back = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[-2]))
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_count_skips_items_left_by_read_author(self):
+        """Записи FeedItem автора, переставшего раскладываться,
+        не считаются второй раз."""
+        Follow.objects.create(
+            user=FollowFeedTests.follower, author=FollowFeedTests.author
+        )
+        fan = User.objects.create_user(username='test_fan')
+        Follow.objects.create(user=fan, author=FollowFeedTests.author)
+        self.assertTrue(FeedItem.objects.filter(
+            user=FollowFeedTests.follower).exists())
+        feed = FollowFeed(FollowFeedTests.follower)
+        self.assertEqual(feed.read_authors, [FollowFeedTests.author.pk])
+        self.assertEqual(feed.count(), 1)
+        self.assertEqual(feed[0:10], [FollowFeedTests.old_post])
+
+    @override_settings(
+        FEED_FANOUT_MAX_FOLLOWERS=2,
+        FEED_FANOUT_RESUME_RATIO=0.5,
+        FEED_FANOUT_MODE='sync',
+    )
+    def test_fan_out_resumes_below_lower_threshold(self):
+        """Раскладка включается снова не на границе лимита, а когда
+        подписчиков осталось не больше доли лимита, и одним запросом
+        дополняет ленты оставшихся подписчиков."""
+        fans = [
+            User.objects.create_user(username=f'test_fan_{i}')
+            for i in range(3)
+        ]
+        follows = [
+            Follow.objects.create(user=fan, author=FollowFeedTests.author)
+            for fan in fans
+        ]
+        Post.objects.create(author=FollowFeedTests.author, text='Новый')
+        stats = FollowFeedTests.author.stats
+        stats.refresh_from_db()
+        self.assertFalse(stats.fanned_out)
+        FeedItem.objects.all().delete()
+        follows[0].delete()
+        stats.refresh_from_db()
+        self.assertFalse(stats.fanned_out)
+        self.assertFalse(FeedItem.objects.exists())
+        with CaptureQueriesContext(connection) as queries:
+            follows[1].delete()
+        inserts = [
+            query for query in queries
+            if query['sql'].startswith('INSERT')
+        ]
+        self.assertEqual(len(inserts), 1)
+        stats.refresh_from_db()
+        self.assertTrue(stats.fanned_out)
+        self.assertEqual(
+            FeedItem.objects.filter(user=fans[2]).count(),
+            Post.objects.filter(author=FollowFeedTests.author).count(),
+        )
+        self.assertFalse(FeedItem.objects.exclude(user=fans[2]).exists())
@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.follows import followed_ids, forget
+from posts.models import Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class FollowedIdsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description='Описание'
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(5)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, group=cls.group, text='Пост')
+        Follow.objects.create(user=cls.reader, author=cls.authors[0])
+        Follow.objects.create(user=cls.reader, author=cls.authors[3])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.url = reverse('posts:group_list', kwargs={'slug': 'test_slug'})
+
+    def follow_queries(self, captured):
+        return [
+            query for query in captured
+            if 'FROM "posts_follow"' in query['sql']
+        ]
+
+    def test_loaded_once_per_request(self):
+        """Подписки загружаются одним запросом и запоминаются."""
+        request = RequestFactory().get('/')
+        request.user = self.reader
+        with self.assertNumQueries(1):
+            ids = followed_ids(request)
+            self.assertIs(followed_ids(request), ids)
+        self.assertEqual(
+            ids, {self.authors[0].pk, self.authors[3].pk}
+        )
+        Follow.objects.create(user=self.reader, author=self.authors[1])
+        forget(request)
+        self.assertIn(self.authors[1].pk, followed_ids(request))
+
+    def test_feed_buttons_cost_one_query(self):
+        """Кнопки подписки у всех авторов ленты — один запрос."""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.reader_client.get(self.url)
+        self.assertEqual(len(self.follow_queries(captured)), 1)
+        self.assertContains(response, 'Отписаться', count=2)
+        self.assertContains(response, 'Подписаться', count=3)
+
+    def test_no_query_for_guest(self):
+        """Анониму кнопки не показываются и подписки не читаются."""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.guest_client.get(self.url)
+        self.assertEqual(self.follow_queries(captured), [])
+        self.assertNotContains(response, 'Подписаться')
+
+    @override_settings(CACHE_SHARED=True)
+    def test_follow_invalidates_cached_page(self):
+        """После подписки страница не отдаётся как неизменённая."""
+        response = self.reader_client.get(self.url)
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author_1'}
+        ))
+        response = self.reader_client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Отписаться', count=3)
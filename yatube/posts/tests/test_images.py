@@ -0,0 +1,117 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.forms import PostForm
+from posts.models import Post
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+User = get_user_model()
+
+
+def uploaded_image(name, size, mode='RGB', image_format='JPEG', **params):
+    file_obj = BytesIO()
+    color = (10, 120, 200, 100) if mode == 'RGBA' else (10, 120, 200)
+    Image.new(mode, size, color).save(file_obj, image_format, **params)
+    return SimpleUploadedFile(name, file_obj.getvalue())
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POST_IMAGE_MAX_SIZE=(400, 300),
+    POST_IMAGE_MAX_PIXELS=1_000_000,
+    POST_THUMBNAILS_MODE='sync',
+)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(ImageUploadTests.user)
+
+    def clean_image(self, upload):
+        form = PostForm(data={'text': 'Пост'}, files={'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        return form.cleaned_data['image']
+
+    def test_small_image_is_kept(self):
+        """Небольшая картинка без метаданных сохраняется как есть."""
+        upload = uploaded_image('small.gif', (20, 10), image_format='GIF')
+        self.assertIs(self.clean_image(upload), upload)
+
+    def test_large_image_is_downsampled(self):
+        """Большая картинка уменьшается, EXIF вырезается,
+        JPEG становится прогрессивным.
+        """
+        exif = Image.Exif()
+        exif[0x010F] = 'Телефон'
+        upload = uploaded_image(
+            'photo.jpeg', (1000, 500), exif=exif.tobytes()
+        )
+        self.assertIn(b'Exif', upload.read())
+        upload.seek(0)
+        image = Image.open(self.clean_image(upload))
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (400, 200))
+        self.assertNotIn('exif', image.info)
+        self.assertTrue(image.info.get('progressive'))
+
+    def test_metadata_is_stripped_from_small_image(self):
+        """Метаданные вырезаются и у картинки в пределах размеров."""
+        exif = Image.Exif()
+        exif[0x8298] = 'Автор'
+        upload = uploaded_image('photo.jpg', (100, 80), exif=exif.tobytes())
+        image = Image.open(self.clean_image(upload))
+        self.assertEqual(image.size, (100, 80))
+        self.assertNotIn('exif', image.info)
+
+    def test_transparency_is_kept(self):
+        """Картинка с прозрачностью не превращается в JPEG."""
+        upload = uploaded_image(
+            'logo.png', (800, 600), mode='RGBA', image_format='PNG'
+        )
+        image = Image.open(self.clean_image(upload))
+        self.assertIn(image.format, ('PNG', 'WEBP'))
+        self.assertEqual(image.mode, 'RGBA')
+        self.assertEqual(image.size, (400, 300))
+
+    def test_too_many_pixels(self):
+        """Картинка больше предела по пикселям отклоняется."""
+        upload = uploaded_image('huge.png', (2000, 1000), image_format='PNG')
+        form = PostForm(data={'text': 'Пост'}, files={'image': upload})
+        self.assertFalse(form.is_valid())
+        self.assertIn('2000×1000', form.errors['image'][0])
+
+    def test_create_stores_processed_image(self):
+        """Созданный пост хранит уменьшенную картинку."""
+        self.author_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с фото',
+                'image': uploaded_image('photo.jpeg', (900, 900)),
+            },
+        )
+        post = Post.objects.get(text='Пост с фото')
+        self.assertEqual(post.image.name, 'posts/photo.jpg')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (300, 300))
@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import search
+from posts.models import FeedItem, Follow, Group, Post, UserStats
+
+
+User = get_user_model()
+
+
+class ImportPostsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_author')
+        cls.reader = User.objects.create_user(username='test_reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание группы',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def import_posts(self, path, **options):
+        err = StringIO()
+        call_command(
+            'import_posts', path, stdout=StringIO(), stderr=err, **options
+        )
+        return err.getvalue()
+
+    def test_import_jsonl(self):
+        """Посты из JSONL загружаются с датой, группой и картинкой,
+        неверные строки пропускаются с указанием номера строки.
+        """
+        rows = [
+            {'text': 'Старый пост', 'author': 'test_author',
+             'group': 'test_slug', 'pub_date': '2015-06-01T12:00:00',
+             'image': 'posts/old.jpg'},
+            {'text': 'Пост без группы', 'author': 'test_author'},
+            {'text': '   ', 'author': 'test_author'},
+            {'text': 'Чужой', 'author': 'nobody'},
+            {'text': 'Без группы', 'author': 'test_author',
+             'group': 'missing'},
+            {'text': 'Дата', 'author': 'test_author', 'pub_date': 'вчера'},
+            {'text': 'Файл', 'author': 'test_author', 'image': 'a.exe'},
+            {'text': 'Список', 'author': ['test_author']},
+            {'text': 'Число', 'author': 'test_author', 'pub_date': 123},
+            {'text': 7, 'author': 'test_author'},
+        ]
+        path = self.write(
+            'posts.jsonl',
+            '\n'.join(json.dumps(row) for row in rows) + '\n{oops\n',
+        )
+        errors = self.import_posts(path, chunk_size=1)
+        self.assertEqual(Post.objects.count(), 2)
+        for line in range(3, 12):
+            with self.subTest(line=line):
+                self.assertIn(f'Строка {line}:', errors)
+        old = Post.objects.get(text='Старый пост')
+        self.assertEqual(old.pub_date.year, 2015)
+        self.assertEqual(old.group, ImportPostsTests.group)
+        self.assertEqual(old.image.name, 'posts/old.jpg')
+
+    def test_import_csv_rebuilds_derived_data(self):
+        """После загрузки CSV обновлены счётчики, ленты и поиск."""
+        path = self.write(
+            'posts.csv',
+            'text,author,group\n'
+            'Котики из архива,test_author,test_slug\n'
+            '"Пост, с запятой",test_author,\n',
+        )
+        self.import_posts(path)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(
+            UserStats.objects.get(user=ImportPostsTests.author).posts_count,
+            2,
+        )
+        self.assertEqual(
+            FeedItem.objects.filter(user=ImportPostsTests.reader).count(), 2
+        )
+        self.assertEqual(
+            [post.text for post in search.get_page('котик', '', 10)],
+            ['Котики из архива'],
+        )
+
+    def test_failed_import_rebuilds_imported_chunks(self):
+        """Если загрузка оборвалась, для уже записанных пачек всё равно
+        пересчитываются счётчики и ленты."""
+        path = self.write(
+            'posts.jsonl',
+            '\n'.join(
+                json.dumps({'text': f'Пост {i}', 'author': 'test_author'})
+                for i in range(3)
+            ),
+        )
+        bulk_create = Post.objects.bulk_create
+
+        def break_after_first(batch):
+            if Post.objects.exists():
+                raise RuntimeError('Обрыв соединения')
+            return bulk_create(batch)
+
+        with mock.patch.object(
+            Post.objects, 'bulk_create', break_after_first
+        ):
+            with self.assertRaises(RuntimeError):
+                self.import_posts(path, chunk_size=1)
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(
+            UserStats.objects.get(user=ImportPostsTests.author).posts_count,
+            1,
+        )
+        self.assertEqual(
+            FeedItem.objects.filter(user=ImportPostsTests.reader).count(), 1
+        )
@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Follow, Group, Post
 
 User = get_user_model()
 
@@ -62,3 +63,13 @@ class PostModelTests(TestCase):
                     test_post._meta.get_field(field).help_text,
                     expected_value
                 )
+
+
+class FollowModelTests(TestCase):
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора запрещена на уровне БД."""
+        user = User.objects.create_user(username='follower')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=user, author=author)
@@ -0,0 +1,221 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Post, Group
+from posts.paginators import KeysetPaginator, feed_count, page_window
+from posts.views import POSTS_PER_PAGE
+
+
+User = get_user_model()
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='Test_slug',
+            description='Тестовое описание группы',
+        )
+        Post.objects.bulk_create([
+            Post(
+                author=cls.user,
+                group=cls.group,
+                text=f'Тестовый пост № {i}',
+            )
+            for i in range(25)
+        ])
+        # Половина постов с одинаковой датой: порядок решает id.
+        Post.objects.filter(
+            pk__in=Post.objects.order_by('id').values('pk')[:12]
+        ).update(pub_date=timezone.now())
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_pages_walk_forward_and_back(self):
+        """Переход по курсорам вперёд и назад обходит все посты
+        без пропусков и повторов.
+        """
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        pages = [paginator.get_page('')]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(
+            [post for page in pages for post in page],
+            self.expected,
+        )
+        self.assertFalse(pages[0].has_previous())
+        back = paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[1]))
+        back = paginator.get_page(back.previous_cursor)
+        self.assertEqual(list(back), list(pages[0]))
+        self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        for cursor in ('', 'мусор', 'WyJuZXh0IiwgWzFdXQ=='):
+            with self.subTest(cursor=cursor):
+                page = paginator.get_page(cursor)
+                self.assertEqual(list(page), self.expected[:10])
+
+    def test_out_of_range_cursor_returns_first_page(self):
+        """Курсор с id за пределами INTEGER базы открывает первую
+        страницу ленты и API, а не ошибку."""
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        cursor = paginator.encode_cursor(
+            {'pub_date': timezone.now(), 'id': 10 ** 30}, 'next'
+        )
+        self.assertIsNone(paginator.decode_cursor(cursor))
+        for url in (reverse('posts:index'), reverse('posts:api_index')):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+
+    def test_null_and_naive_cursor_values_return_first_page(self):
+        """Курсор с null или датой без часового пояса открывает первую
+        страницу лент, API и комментариев, а не ошибку."""
+        paginator = KeysetPaginator(Post.objects.all(), 10)
+        cursors = [
+            base64.urlsafe_b64encode(json.dumps(raw).encode()).decode()
+            for raw in (
+                ['next', [None, 5]],
+                ['prev', ['2020-01-01T00:00:00', None]],
+                ['next', ['2020-01-01T00:00:00', 5]],
+            )
+        ]
+        post_id = Post.objects.values_list('pk', flat=True).first()
+        urls = (
+            (reverse('posts:index'), 'cursor'),
+            (reverse('posts:group_list', kwargs={
+                'slug': self.group.slug}), 'cursor'),
+            (reverse('posts:api_index'), 'cursor'),
+            (reverse('posts:post_detail', args=[post_id]), 'comments'),
+            (reverse('posts:post_comments', args=[post_id]), 'cursor'),
+        )
+        for cursor in cursors:
+            self.assertIsNone(paginator.decode_cursor(cursor))
+            for url, param in urls:
+                with self.subTest(url=url, cursor=cursor):
+                    response = self.guest_client.get(url, {param: cursor})
+                    self.assertEqual(response.status_code, 200)
+
+    def test_feed_views_accept_cursor(self):
+        """Ленты переключаются на курсорную пагинацию по ?cursor=."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={
+                'username': self.user.username}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url + '?cursor=')
+                page_obj = response.context['page_obj']
+                self.assertTrue(page_obj.is_keyset)
+                self.assertEqual(list(page_obj), self.expected[:10])
+                self.assertContains(
+                    response, f'?cursor={page_obj.next_cursor}'
+                )
+                response = self.guest_client.get(
+                    url + f'?cursor={page_obj.next_cursor}'
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']),
+                    self.expected[10:20],
+                )
+
+
+class PageWindowTests(SimpleTestCase):
+    def window(self, number, pages):
+        paginator = Paginator(range(pages), 1)
+        return page_window(paginator.page(number))
+
+    def test_window(self):
+        """Переключатель показывает края и соседей текущей страницы."""
+        self.assertEqual(self.window(1, 3), [1, 2, 3])
+        self.assertEqual(self.window(1, 100), [1, 2, 3, None, 100])
+        self.assertEqual(
+            self.window(50, 100), [1, None, 48, 49, 50, 51, 52, None, 100]
+        )
+        self.assertEqual(self.window(4, 100), [1, 2, 3, 4, 5, 6, None, 100])
+        self.assertEqual(self.window(100, 100), [1, None, 98, 99, 100])
+
+
+class FeedCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_auth')
+        Post.objects.bulk_create([
+            Post(author=cls.user, text=f'Пост {i}')
+            for i in range(POSTS_PER_PAGE * 8)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def count_queries(self, captured):
+        return [
+            query for query in captured if 'COUNT(' in query['sql']
+        ]
+
+    @override_settings(CACHE_SHARED=True, FEED_COUNT_STALE_SECONDS=0)
+    def test_count_is_cached_until_feed_changes(self):
+        """COUNT(*) выполняется один раз до изменения ленты."""
+        posts = Post.objects.all()
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(feed_count('index', posts), 80)
+            self.assertEqual(feed_count('index', posts), 80)
+        self.assertEqual(len(self.count_queries(captured)), 1)
+        Post.objects.create(author=self.user, text='Новый пост')
+        self.assertEqual(feed_count('index', posts), 81)
+
+    @override_settings(FEED_COUNT_STALE_SECONDS=60)
+    def test_stale_count_is_reused(self):
+        """Недавнее число отдаётся и после изменения ленты."""
+        posts = Post.objects.all()
+        feed_count('index', posts)
+        Post.objects.create(author=self.user, text='Новый пост')
+        with self.assertNumQueries(0):
+            self.assertEqual(feed_count('index', posts), 80)
+
+    @override_settings(CACHE_SHARED=False, FEED_COUNT_STALE_SECONDS=0)
+    def test_count_is_not_tied_to_local_version(self):
+        """Без общего кеша число не держится на версии ленты:
+        другой воркер мог изменить ленту, не обновив нашу версию."""
+        posts = Post.objects.all()
+        feed_count('index', posts)
+        with self.assertNumQueries(1):
+            self.assertEqual(feed_count('index', posts), 80)
+
+    def test_profile_pages_without_count_query(self):
+        """Повторная страница ленты не считает посты и не выводит
+        номера всех страниц.
+        """
+        url = reverse('posts:profile', kwargs={'username': 'test_auth'})
+        self.guest_client.get(url)
+        with CaptureQueriesContext(connection) as captured:
+            response = self.guest_client.get(url, {'page': 4})
+        self.assertEqual(self.count_queries(captured), [])
+        self.assertEqual(response.context['page_obj'].paginator.count, 80)
+        self.assertContains(response, '…', count=1)
+        for number in (1, 2, 3, 5, 6, 8):
+            with self.subTest(number=number):
+                self.assertContains(response, f'?page={number}"')
+        self.assertNotContains(response, '?page=7"')
@@ -0,0 +1,118 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search, stemmer
+from posts.models import Post
+
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_auth')
+        cls.cats = Post.objects.create(
+            author=cls.user,
+            text='Котики и котята: про котиков можно писать бесконечно',
+        )
+        cls.cat = Post.objects.create(
+            author=cls.user,
+            text='Вчера видел котика во дворе',
+        )
+        cls.dog = Post.objects.create(
+            author=cls.user,
+            text='Собаки лучше',
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def found(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return list(response.context['page_obj'])
+
+    def test_stem_word_forms(self):
+        """Формы одного слова сводятся к общей основе."""
+        for words in (
+            ('котик', 'котика', 'котиков', 'котики'),
+            ('собака', 'собаки', 'собакам'),
+            ('писать', 'писал', 'писали'),
+            ('Ёлка', 'елки'),
+        ):
+            with self.subTest(words=words):
+                self.assertEqual(len({stemmer.stem(w) for w in words}), 1)
+
+    def test_search_ranks_word_forms(self):
+        """Поиск находит посты по другим формам слова,
+        более релевантные посты идут первыми.
+        """
+        self.assertEqual(
+            self.found('котики'), [SearchTests.cats, SearchTests.cat]
+        )
+        self.assertEqual(self.found('собака'), [SearchTests.dog])
+        self.assertEqual(self.found('котик собака'), [])
+        self.assertEqual(self.found(''), [])
+        self.assertEqual(self.found('и во'), [])
+
+    def test_index_follows_edit_and_delete(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        dog = Post.objects.get(pk=SearchTests.dog.pk)
+        dog.text = 'Кошки лучше собак'
+        dog.save()
+        self.assertEqual(self.found('собака'), [dog])
+        self.assertEqual(self.found('кошка'), [dog])
+        dog.text = 'Кошки лучше'
+        dog.save(update_fields=['text'])
+        self.assertEqual(self.found('собака'), [])
+        dog.delete()
+        self.assertEqual(self.found('кошка'), [])
+
+    def test_search_cursor_walks_all_results(self):
+        """Курсоры обходят все результаты без пропусков и повторов."""
+        Post.objects.bulk_create([
+            Post(author=SearchTests.user, text='котик ' * (i % 4 + 1))
+            for i in range(25)
+        ])
+        call_command('rebuild_search_index', stdout=StringIO())
+        pages = [search.get_page('котик', '', 10)]
+        while pages[-1].has_next():
+            pages.append(
+                search.get_page('котик', pages[-1].next_cursor, 10)
+            )
+        found = [post for page in pages for post in page]
+        self.assertEqual([len(page) for page in pages], [10, 10, 7])
+        self.assertEqual(len(set(found)), 27)
+        ranks = [post.rank for post in found]
+        self.assertEqual(ranks, sorted(ranks))
+        back = search.get_page('котик', pages[-1].previous_cursor, 10)
+        self.assertEqual(list(back), list(pages[1]))
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'котик'}
+        )
+        self.assertContains(
+            response, f'?q=%D0%BA%D0%BE%D1%82%D0%B8%D0%BA&amp;cursor='
+            f'{pages[0].next_cursor}'
+        )
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по тому же индексу."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котиков'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {SearchTests.cats, SearchTests.cat},
+        )
@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Post
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+User = get_user_model()
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, func, *args):
+        self.jobs.append((func, args))
+
+    def run(self):
+        for func, args in self.jobs:
+            func(*args)
+        self.jobs = []
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAILS_MODE='thread')
+class ThumbnailsPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(ThumbnailsPipelineTests.user)
+        self.executor = FakeExecutor()
+        patcher = mock.patch.object(
+            thumbnails, 'get_executor', return_value=self.executor
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Задания генерации не закрывают соединение с тестовой БД.
+        patcher = mock.patch.object(
+            thumbnails, '_generate_in_thread', thumbnails.generate
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def uploaded_image(self, name):
+        file_obj = BytesIO()
+        Image.new('RGB', (1200, 800), color=(200, 0, 0)).save(file_obj, 'png')
+        return SimpleUploadedFile(name, file_obj.getvalue(), 'image/png')
+
+    def test_thumbnails_are_pregenerated_after_create(self):
+        """После создания поста все размеры миниатюр готовятся в фоне."""
+        # TestCase не фиксирует транзакцию, поэтому on_commit
+        # вызывается сразу.
+        with mock.patch(
+            'django.db.transaction.on_commit', lambda func: func()
+        ):
+            self.author_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Пост', 'image': self.uploaded_image('a.png')},
+            )
+        post = Post.objects.get(text='Пост')
+        self.assertEqual(len(self.executor.jobs), 1)
+        for geometry in settings.POST_THUMBNAILS:
+            with self.subTest(geometry=geometry):
+                self.assertIsNone(
+                    thumbnails.ready_thumbnail(post.image, geometry))
+        self.executor.run()
+        for geometry in settings.POST_THUMBNAILS:
+            with self.subTest(geometry=geometry):
+                self.assertIsNotNone(
+                    thumbnails.ready_thumbnail(post.image, geometry))
+
+    def test_placeholder_until_thumbnail_is_ready(self):
+        """Пока миниатюра не готова, страница показывает заглушку
+        и не обрабатывает картинку во время запроса.
+        """
+        post = Post.objects.create(
+            author=ThumbnailsPipelineTests.user,
+            text='Пост с картинкой',
+            image=self.uploaded_image('b.png'),
+        )
+        url = reverse('posts:profile', kwargs={'username': 'test_auth'})
+        with mock.patch.object(thumbnails, 'get_thumbnail') as generator:
+            response = self.author_client.get(url)
+            generator.assert_not_called()
+        self.assertContains(response, 'bg-light')
+        self.assertNotContains(response, '<img src=')
+        self.executor.run()
+        response = self.author_client.get(url)
+        self.assertContains(response, '<img src=')
+        thumbnail = thumbnails.ready_thumbnail(post.image, '100x100')
+        self.assertContains(response, thumbnail.url)
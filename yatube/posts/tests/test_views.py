@@ -9,6 +9,8 @@ from django.db.models.fields.files import ImageFieldFile
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 
 from posts.models import Post, Group, Comment, Follow
@@ -422,3 +424,63 @@ class PostViewsCacheTests(TestCase):
             response3.content,
             'Пост из кеша не удалился из контента страницы'
         )
+
+
+class PostViewsQueriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def create_feeds(self, num):
+        """Создаёт ленты по num постов, где у каждого поста свой автор
+        или своя группа.
+        """
+        follower = User.objects.create_user(username=f'follower_{num}')
+        main_author = User.objects.create_user(username=f'main_{num}')
+        main_group = Group.objects.create(
+            title='Основная группа',
+            slug=f'main_{num}',
+            description='Описание',
+        )
+        for i in range(num):
+            author = User.objects.create_user(
+                username=f'author_{num}_{i}',
+                first_name=f'Имя {i}',
+                last_name=f'Фамилия {i}',
+            )
+            group = Group.objects.create(
+                title=f'Группа {i}',
+                slug=f'group_{num}_{i}',
+                description='Описание',
+            )
+            Follow.objects.create(user=follower, author=author)
+            Post.objects.create(author=author, group=main_group, text='Пост')
+            Post.objects.create(author=main_author, group=group, text='Пост')
+        return follower, main_author, main_group
+
+    def count_queries(self, num):
+        follower, author, group = self.create_feeds(num)
+        follower_client = Client()
+        follower_client.force_login(follower)
+        urls = {
+            'posts:index': (reverse('posts:index'), self.guest_client),
+            'posts:group_list': (reverse('posts:group_list', kwargs={
+                'slug': group.slug}), self.guest_client),
+            'posts:profile': (reverse('posts:profile', kwargs={
+                'username': author.username}), self.guest_client),
+            'posts:follow_index': (
+                reverse('posts:follow_index'), follower_client),
+        }
+        queries = {}
+        for name, (url, client) in urls.items():
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            queries[name] = len(context)
+        Post.objects.all().delete()
+        return queries
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        self.assertEqual(self.count_queries(1), self.count_queries(5))
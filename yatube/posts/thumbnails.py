@@ -0,0 +1,104 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+После сохранения поста с картинкой все размеры из settings.POST_THUMBNAILS
+генерируются в пуле потоков, а шаблоны берут миниатюру только если она
+уже готова (ready_thumbnail), иначе показывают заглушку. Так декодирование
+и масштабирование картинки не попадают во время ответа на запрос.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics
+
+from . import cards, etags
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POST_THUMBNAILS_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+@metrics.timer('thumbnail')
+def ready_thumbnail(file_, geometry):
+    """Готовая миниатюра из хранилища sorl или None.
+
+    Повторяет вычисление имени миниатюры из ThumbnailBackend.get_thumbnail,
+    но ничего не генерирует.
+    """
+    backend = default.backend
+    source = ImageFile(file_)
+    options = dict(settings.POST_THUMBNAILS[geometry])
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+@metrics.timer('thumbnail')
+def generate(name):
+    """Генерирует все размеры миниатюр картинки и меняет версии
+    страниц постов с этой картинкой, отданных с заглушкой.
+    """
+    try:
+        # Ключи sorl зависят от хранилища: то же, что у поля модели,
+        # иначе ready_thumbnail не найдёт миниатюры.
+        source = ImageFile(name, Post._meta.get_field('image').storage)
+        for geometry, options in settings.POST_THUMBNAILS.items():
+            get_thumbnail(source, geometry, **options)
+        posts = Post.objects.filter(image=name).values_list(
+            'pk', 'author_id', 'group_id'
+        )
+        for pk, author_id, group_id in posts:
+            cards.bump_version('post', pk)
+            etags.bump_post_feeds(author_id, group_id)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры %s', name)
+    finally:
+        with _lock:
+            _pending.discard(name)
+
+
+def _generate_in_thread(name):
+    try:
+        generate(name)
+    finally:
+        connection.close()
+
+
+def schedule(name):
+    """Ставит картинку в очередь на подготовку миниатюр."""
+    with _lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    if settings.POST_THUMBNAILS_MODE == 'sync':
+        generate(name)
+    else:
+        get_executor().submit(_generate_in_thread, name)
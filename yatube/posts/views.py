@@ -1,17 +1,58 @@
+from functools import partial
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 
+from . import comment_queue, etags, exports, follows, search, thumbnails
+from .feeds import FollowFeed, FollowFeedPaginator
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from .models import Comment, Group, Post, User, Follow
+from .paginators import FeedPaginator, KeysetPaginator, feed_count
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+
+
+def get_page_obj(request, posts, scope=None,
+                 keyset_paginator=KeysetPaginator):
+    """Страница ленты: по номеру (?page=) или по курсору (?cursor=).
+
+    Для ленты с версией scope (см. etags.feed_key) число постов
+    берётся из кеша, а не считается на каждый запрос.
+    """
+    if 'cursor' in request.GET:
+        paginator = keyset_paginator(posts, POSTS_PER_PAGE)
+        return paginator.get_page(request.GET['cursor'])
+    count = None
+    if scope is not None:
+        count = partial(feed_count, scope, posts)
+    paginator = FeedPaginator(posts, POSTS_PER_PAGE, count=count)
+    return paginator.get_page(request.GET.get('page'))
+
 
+def get_comments_page(post_id, cursor):
+    """Порция комментариев поста от новых к старым по курсору."""
+    comments = Comment.objects.filter(post=post_id).select_related('author')
+    paginator = KeysetPaginator(
+        comments, COMMENTS_PER_PAGE, keys=('created', 'id')
+    )
+    return paginator.get_page(cursor)
+
+
+def schedule_thumbnails(post):
+    if post.image:
+        transaction.on_commit(partial(thumbnails.schedule, post.image.name))
 
+
+@etags.conditional(etags.index_keys, etags.INDEX_STALE_WINDOW)
 def index(request):
     template = 'posts/index.html'
     title = 'Последние обновления на сайте'
-    paginator = Paginator(Post.objects.all(), 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page_obj(request, Post.objects.for_feed(), 'index')
     context = {
         'page_obj': page_obj,
         'title': title,
@@ -20,13 +61,14 @@ def index(request):
     return render(request, template, context)
 
 
+@etags.conditional(etags.group_keys)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
     title = f'Записи сообщества {group.title}'
-    paginator = Paginator(group.posts.all(), 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page_obj(
+        request, group.posts.for_feed(), f'group:{group.pk}'
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -35,17 +77,18 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@etags.conditional(etags.profile_keys)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
     title = f'Профайл пользователя {author.username}'
-    paginator = Paginator(author.posts.all(), 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).exists()
+    page_obj = get_page_obj(
+        request, author.posts.for_feed(), f'author:{author.pk}'
+    )
+    following = author.pk in follows.followed_ids(request)
     context = {
         'user_s': author,
         'page_obj': page_obj,
@@ -55,21 +98,94 @@ def profile(request, username):
     return render(request, template, context)
 
 
+@etags.conditional(etags.post_keys)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        pk=post_id
+    )
     form = CommentForm()
     title = f'Пост {post.text[:29]}'
     form_title = 'Добавить комментарий:'
+    comments_page = get_comments_page(post.pk, request.GET.get('comments'))
     context = {
         'post': post,
         'title': title,
         'form': form,
         'form_title': form_title,
+        'comments_page': comments_page,
     }
     return render(request, template, context)
 
 
+@etags.conditional(etags.post_keys)
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    page = get_comments_page(post_id, request.GET.get('cursor'))
+    comments = [
+        {
+            'id': comment.pk,
+            'author': comment.author.username,
+            'author_url': reverse(
+                'posts:profile', args=[comment.author.username]
+            ),
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+        }
+        for comment in page
+    ]
+    return JsonResponse({
+        'comments': comments,
+        'next_cursor': page.next_cursor,
+    })
+
+
+def post_search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    title = f'Поиск: {query}' if query else 'Поиск'
+    page_obj = search.get_page(
+        query, request.GET.get('cursor'), POSTS_PER_PAGE
+    )
+    context = {
+        'page_obj': page_obj,
+        'title': title,
+        'query': query,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, template, context)
+
+
+def export_response(request, posts, name):
+    file_format = request.GET.get('format', 'ndjson')
+    if file_format not in exports.FORMATS:
+        file_format = 'ndjson'
+    records = exports.iter_records(posts, request.build_absolute_uri)
+    response = StreamingHttpResponse(
+        exports.lines(records, file_format),
+        content_type=exports.FORMATS[file_format],
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}.{file_format}"'
+    )
+    return response
+
+
+@login_required
+def group_export(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(request, group.posts.all(), f'group-{slug}')
+
+
+@login_required
+def profile_export(request, username):
+    author = get_object_or_404(User, username=username)
+    return export_response(
+        request, author.posts.all(), f'profile-{username}'
+    )
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -81,7 +197,9 @@ def post_create(request):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        with transaction.atomic():
+            post.save()
+        schedule_thumbnails(post)
         return redirect('posts:profile', username=post.author.username)
     context = {
         'form': form,
@@ -104,6 +222,8 @@ def post_edit(request, post_id):
     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            schedule_thumbnails(post)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'form': form,
@@ -116,13 +236,13 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        comment_queue.save(comment)
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -130,10 +250,10 @@ def add_comment(request, post_id):
 def follow_index(request):
     template = 'posts/follow.html'
     title = 'Последние обновления в подписках'
-    f_posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(f_posts, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_page_obj(
+        request, FollowFeed(request.user),
+        keyset_paginator=FollowFeedPaginator,
+    )
     context = {
         'page_obj': page_obj,
         'title': title,
@@ -146,18 +266,22 @@ def follow_index(request):
 def profile_follow(request, username):
     following = get_object_or_404(User, username=username)
     if not request.user == following:
-        Follow.objects.get_or_create(
-            user=request.user,
-            author=following
-        )
+        with transaction.atomic():
+            Follow.objects.get_or_create(
+                user=request.user,
+                author=following
+            )
+        follows.forget(request)
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     following = get_object_or_404(User, username=username)
-    Follow.objects.filter(
-        user=request.user,
-        author=following
-    ).delete()
+    with transaction.atomic():
+        Follow.objects.filter(
+            user=request.user,
+            author=following
+        ).delete()
+    follows.forget(request)
     return redirect('posts:profile', username=username)
@@ -0,0 +1,21 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``, e.g. for ``uvicorn yatube.asgi:application``.
+
+Django 2.2 has no ASGI support of its own, so the WSGI application is
+run in a thread pool by core.asgi.AsgiHandler.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+wsgi_application = get_wsgi_application()
+
+from core.asgi import AsgiHandler  # noqa: E402
+
+application = AsgiHandler(wsgi_application)
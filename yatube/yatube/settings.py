@@ -23,7 +23,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = 'zy3^2^pdxpclz(!^&^xmx#hs+q-1d7p3uu!65je945s=c@wm&='
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.getenv('YATUBE_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -50,6 +50,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,18 +64,29 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    # Без отладки шаблон читается и компилируется один раз на процесс,
+    # а не на каждый get_template и {% include %}.
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'core.context_processors.year.year'
+                'core.context_processors.year.year',
+                'core.context_processors.follows.follows',
             ],
         },
     },
@@ -85,13 +98,46 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Бэкенд core.db — sqlite3 с PRAGMA при подключении и транзакциями
+# BEGIN IMMEDIATE, см. core/db/base.py. Писатель ждёт блокировку
+# до OPTIONS['timeout'] секунд, соединение живёт CONN_MAX_AGE секунд.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_CONN_MAX_AGE', 60)),
+        'OPTIONS': {
+            'timeout': 20,
+        },
+        'PRAGMAS': {
+            'journal_mode': 'wal',
+            'synchronous': 'normal',
+            'cache_size': -64000,
+            'mmap_size': 256 * 1024 * 1024,
+            'temp_store': 'memory',
+        },
+        'TRANSACTION_MODE': 'IMMEDIATE',
     }
 }
 
+# Реплики для чтения: пути к копиям базы через запятую
+# в YATUBE_DB_REPLICAS. Чтение уходит на реплики, запись — в default
+# (core.routers.ReplicaRouter). После записи сеанс читает из default
+# ещё REPLICA_PIN_SECONDS секунд, чтобы видеть свои изменения.
+# Локально копии обновляет команда sync_replicas.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    DATABASE_REPLICAS.append(f'replica_{number}')
+    DATABASES[f'replica_{number}'] = dict(
+        DATABASES['default'],
+        NAME=path.strip(),
+        TEST={'MIRROR': 'default'},
+    )
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -144,8 +190,117 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Бэкенд кеша выбирается переменной окружения YATUBE_CACHE_BACKEND.
+# locmem — отдельный кеш в каждом процессе; file и memcached — общий
+# для всех воркеров (для memcached YATUBE_CACHE_LOCATION может быть
+# unix-сокетом: unix:/run/memcached/memcached.sock).
+#
+# В кеше лежит карточка каждого показанного поста (posts/cards.py),
+# а ещё версии, числа постов лент и фрагменты страниц, поэтому
+# стандартных 300 записей не хватает: карточки вытеснялись бы почти
+# сразу после записи. MAX_ENTRIES рассчитан на карточки всех
+# постов (YATUBE_CACHE_MAX_ENTRIES). При переполнении удаляется
+# 1/CULL_FREQUENCY записей; FileBasedCache при этом перечисляет весь
+# каталог, поэтому для него чистка реже и крупнее. memcached
+# ограничен памятью сервера (-m), OPTIONS его клиенту не нужны.
+CACHE_MAX_ENTRIES = int(os.getenv('YATUBE_CACHE_MAX_ENTRIES', 100000))
+CACHE_BACKENDS = {
+    'locmem': (
+        'django.core.cache.backends.locmem.LocMemCache',
+        '',
+        {'MAX_ENTRIES': CACHE_MAX_ENTRIES, 'CULL_FREQUENCY': 4},
+    ),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        os.path.join(BASE_DIR, 'cache'),
+        {'MAX_ENTRIES': CACHE_MAX_ENTRIES, 'CULL_FREQUENCY': 2},
+    ),
+    'memcached': (
+        'django.core.cache.backends.memcached.MemcachedCache',
+        '127.0.0.1:11211',
+        {},
+    ),
+    'pylibmc': (
+        'django.core.cache.backends.memcached.PyLibMCCache',
+        '127.0.0.1:11211',
+        {},
+    ),
+}
+CACHE_BACKEND_NAME = os.getenv('YATUBE_CACHE_BACKEND', 'locmem')
+CACHE_BACKEND, CACHE_LOCATION, CACHE_OPTIONS = CACHE_BACKENDS[
+    CACHE_BACKEND_NAME
+]
+# Версии в кеше (posts.cards.version_key) согласованы между воркерами,
+# только если кеш общий. С locmem воркер может не увидеть чужое
+# изменение, поэтому валидаторы условных запросов (posts.etags)
+# не выдаются, а число постов ленты (posts.paginators.feed_count)
+# живёт не дольше FEED_COUNT_STALE_SECONDS.
+CACHE_SHARED = CACHE_BACKEND_NAME != 'locmem'
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('YATUBE_CACHE_LOCATION', CACHE_LOCATION),
+        'OPTIONS': CACHE_OPTIONS,
     }
 }
+
+# Посты авторов с большим числом подписчиков не раскладываются
+# по лентам подписок, а подмешиваются при чтении. Раскладка снова
+# включается, только когда подписчиков остаётся не больше
+# FEED_FANOUT_RESUME_RATIO от лимита: автор у самой границы
+# не переключается туда-обратно на каждой подписке. Ленты дополняются
+# постами автора в отдельном потоке (thread) или сразу (sync).
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+FEED_FANOUT_RESUME_RATIO = 0.9
+FEED_FANOUT_MODE = os.getenv(
+    'YATUBE_FEED_FANOUT_MODE',
+    'sync' if DEBUG else 'thread',
+)
+
+# Число постов ленты для номеров страниц кешируется до изменения ленты,
+# а если лента меняется часто — пересчитывается не чаще, чем раз
+# в столько секунд (posts.paginators.feed_count).
+FEED_COUNT_STALE_SECONDS = 30
+
+# Карточки постов, которых нет в кеше (posts/cards.py): True — все
+# карточки страницы рисуются одним скомпилированным шаблоном в общем
+# контексте, False — отдельным render_to_string на каждую карточку.
+POST_CARDS_COMPILED = True
+
+# Запись комментариев (posts/comment_queue.py): sync — каждый
+# комментарий своей транзакцией прямо в запросе, batch — через очередь
+# фонового потока, который сохраняет комментарии, пришедшие
+# за COMMENTS_BATCH_INTERVAL секунд, одним bulk_create. Запрос ждёт
+# записи своего комментария не дольше COMMENTS_BATCH_WAIT секунд.
+COMMENTS_WRITE_MODE = os.getenv('YATUBE_COMMENTS_MODE', 'sync')
+COMMENTS_BATCH_INTERVAL = 0.005
+COMMENTS_BATCH_SIZE = 500
+COMMENTS_BATCH_WAIT = 2
+
+# Размеры миниатюр картинок постов. Они готовятся после сохранения поста:
+# в пуле потоков (thread) или сразу в том же запросе (sync). В режиме
+# отладки по умолчанию sync: миниатюры готовы сразу, без фоновых потоков.
+POST_THUMBNAILS = {
+    '100x100': {'crop': 'center'},
+    '960x339': {'crop': 'center', 'upscale': True},
+}
+POST_THUMBNAILS_MODE = os.getenv(
+    'YATUBE_THUMBNAILS_MODE',
+    'sync' if DEBUG else 'thread',
+)
+POST_THUMBNAILS_WORKERS = 2
+
+# Потоки, в которых ASGI-вход (yatube/asgi.py) выполняет Django:
+# столько запросов обрабатывается одновременно, остальные ждут
+# в очереди, не занимая цикл событий.
+ASGI_THREADS = int(os.getenv('YATUBE_ASGI_THREADS', 16))
+
+# Загрузка картинок постов (posts/images.py): больше
+# POST_IMAGE_MAX_PIXELS пикселей не принимается, больше
+# POST_IMAGE_MAX_SIZE уменьшается до него. Картинки больше
+# POST_IMAGE_KEEP_SIZE байт или с метаданными пережимаются.
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIZE = (2560, 2560)
+POST_IMAGE_KEEP_SIZE = 512 * 1024
+POST_IMAGE_QUALITY = 85